@@ -10,6 +10,7 @@ from data.admin_crud import (
     get_all_journeys,
     get_journey_by_id,
 )
+from data.db_session import identity_map_stats
 from data.models import Admin
 from settings import session
 
@@ -36,6 +37,12 @@ def load_user(user_id):
     return db_admin
 
 
+@app.teardown_appcontext
+def remove_session(exception=None):
+    session.remove()
+    app.logger.debug('Identity map after request: %s', identity_map_stats())
+
+
 @app.errorhandler(404)
 def handle_404(*args, **kwargs):
     return render_template('404.html')
@@ -7,25 +7,37 @@ from aiogram.filters import Command, CommandStart
 from aiogram.fsm.context import FSMContext
 from aiogram.types import Message
 
-
-from data.crud import get_user_by_telegram_userid
+from data.db_session import dispose_async_engine
+from data.fsm_storage import SQLiteStorage
+from data.models import User
+from middlewares.db_session import DbSessionMiddleware
+from middlewares.user import UserMiddleware
 from routers.user_router import user_router, UserForm
 from routers.journey_router import journey_router
 from routers.notes_router import notes_router
+from services.http import close_http_session
+from services.maps import shutdown_map_renderer
 from ux.keyboards import DEFAULT_KEYBOARD
 from ux.typical_answers import generate_welcoming_text
-from settings import session
 from setup import bot
+from settings import FSM_STORAGE_FILE  # creates the database engines and tables on import
 
-dp = Dispatcher()
+storage = SQLiteStorage(FSM_STORAGE_FILE)
+dp = Dispatcher(storage=storage)
+dp.update.outer_middleware(DbSessionMiddleware())
+dp.update.outer_middleware(UserMiddleware())
 dp.include_router(user_router)
 dp.include_router(journey_router)
 dp.include_router(notes_router)
+dp.startup.register(storage.start_sweeper)
+dp.shutdown.register(close_http_session)
+dp.shutdown.register(shutdown_map_renderer)
+dp.shutdown.register(dispose_async_engine)
+dp.shutdown.register(storage.close)
 
 
 @dp.message(CommandStart())
-async def command_start_handler(message: Message, state: FSMContext) -> None:
-    user = await get_user_by_telegram_userid(db_session=session, telegram_id=message.from_user.id)
+async def command_start_handler(message: Message, state: FSMContext, user: User | None) -> None:
     if user is not None:
         await message.answer(
             f'👋 Hello, {message.from_user.username}! Long time no see',
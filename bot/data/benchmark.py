@@ -0,0 +1,410 @@
+'''
+Database benchmarks on throwaway SQLite files.
+
+Lookups: fills a database with `rows` journeys, locations and notes (and
+a tenth as many users), times every hot CRUD lookup with the indexes in
+place, then drops them and times the same lookups again.
+
+Writes: measures commit throughput of a lone writer, then a writer
+running next to reading threads, with SQLite's default journal settings
+and with the connection settings of global_init.
+
+Queries: counts the SQL statements the journey listings issue for users
+with more and more journeys; eager loading keeps the count flat. Exits
+non-zero when a count differs from EXPECTED_QUERY_COUNTS.
+
+    python -m data.benchmark [rows] [repeats]
+    python -m data.benchmark writes [seconds]
+    python -m data.benchmark queries
+'''
+import asyncio
+from datetime import date
+from pathlib import Path
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, List
+
+import sqlalchemy as sa
+from sqlalchemy import select
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
+import sqlalchemy.orm as orm
+
+from . import crud
+from .db_session import (
+    SQLITE_MAX_OVERFLOW,
+    SQLITE_POOL_SIZE,
+    SQLITE_PRAGMAS,
+    SqlAlchemyBase,
+    set_sqlite_pragmas,
+)
+from .migrations import upgrade_schema
+from .models import Journey, Location, Note
+
+BENCHMARK_ROWS = 1_000_000
+BENCHMARK_REPEATS = 200
+INSERT_BATCH = 50_000
+WRITE_BENCHMARK_SECONDS = 5
+WRITE_BENCHMARK_READERS = 4
+QUERY_COUNT_JOURNEYS = (1, 10, 100)
+# Statements per listing, whatever the number of journeys
+EXPECTED_QUERY_COUNTS = {
+    'journey list (selectin)': 2,
+    'journey list (joined)': 1,
+    'journeys with notes': 3,
+    'journey titles': 1,
+}
+
+JOURNAL_SETTINGS: Dict[str, Dict[str, Any]] = {
+    'sqlite defaults': {'journal_mode': 'DELETE', 'synchronous': 'FULL'},
+    'global_init': SQLITE_PRAGMAS,
+}
+
+
+def _fill(db_file: Path, rows: int) -> None:
+    users = max(rows // 10, 1)
+    connection = sqlite3.connect(db_file)
+
+    def insert(sql: str, make_row: Callable[[int], tuple], count: int) -> None:
+        for start in range(0, count, INSERT_BATCH):
+            connection.executemany(
+                sql, (make_row(i) for i in range(start, min(start + INSERT_BATCH, count)))
+            )
+        connection.commit()
+
+    insert(
+        'INSERT INTO users (id, telegram_userid, username, age, living_location, lat, lon, bio) '
+        'VALUES (?, ?, ?, 30, ?, 0, 0, ?)',
+        lambda i: (i + 1, 10_000_000 + i, f'user{i}', 'Home', 'bio'),
+        users,
+    )
+    insert(
+        'INSERT INTO journey (id, owner_id, title, description) VALUES (?, ?, ?, ?)',
+        lambda i: (i + 1, i % users + 1, f'Journey {i // users}', 'description'),
+        rows,
+    )
+    insert(
+        'INSERT INTO location (id, place, date_start, date_end, lat, lon, journey_id) '
+        'VALUES (?, ?, ?, ?, 0, 0, ?)',
+        lambda i: (i + 1, f'Place {i}', '2026-07-01', '2026-07-05', i % rows + 1),
+        rows,
+    )
+    insert(
+        'INSERT INTO note (id, title, content, journey_id) VALUES (?, ?, ?, ?)',
+        lambda i: (i + 1, f'Note {i // rows}', 'content', i % rows + 1),
+        rows,
+    )
+    connection.close()
+
+
+def _lookups(rows: int) -> Dict[str, Callable[..., Awaitable]]:
+    users = max(rows // 10, 1)
+
+    async def user_by_telegram_id(db_session):
+        await crud.get_user_by_telegram_userid(
+            db_session, telegram_id=10_000_000 + random.randrange(users)
+        )
+
+    async def user_journeys(db_session):
+        await crud.get_all_user_journeys(db_session, owner_id=random.randrange(users) + 1)
+
+    async def journey_by_title(db_session):
+        await crud.get_journey_by_title(
+            db_session,
+            owner_id=random.randrange(users) + 1,
+            journey_title=f'Journey {random.randrange(rows // users)}',
+        )
+
+    async def locations_by_journey(db_session):
+        await db_session.execute(
+            select(Location).filter_by(journey_id=random.randrange(rows) + 1)
+        )
+
+    async def location_by_place_and_dates(db_session):
+        i = random.randrange(rows)
+        await db_session.execute(
+            select(Location).filter_by(
+                place=f'Place {i}',
+                date_start=date(2026, 7, 1),
+                date_end=date(2026, 7, 5),
+                journey_id=i % rows + 1,
+            )
+        )
+
+    async def note_by_journey_and_title(db_session):
+        await db_session.execute(
+            select(Note).filter_by(journey_id=random.randrange(rows) + 1, title='Note 0')
+        )
+
+    return {
+        'users.telegram_userid': user_by_telegram_id,
+        'journey.owner_id': user_journeys,
+        'journey(owner_id, title)': journey_by_title,
+        'location.journey_id': locations_by_journey,
+        'location by place and dates': location_by_place_and_dates,
+        'note(journey_id, title)': note_by_journey_and_title,
+    }
+
+
+async def _time_lookups(
+    factory: async_sessionmaker,
+    rows: int,
+    repeats: int,
+) -> Dict[str, float]:
+    ''' Median milliseconds per lookup, each run in a fresh session. '''
+    medians = {}
+    for name, lookup in _lookups(rows).items():
+        timings: List[float] = []
+        for _ in range(repeats):
+            async with factory() as db_session:
+                started = time.perf_counter()
+                await lookup(db_session)
+                timings.append((time.perf_counter() - started) * 1000)
+        medians[name] = statistics.median(timings)
+    return medians
+
+
+def _drop_indexes(db_file: Path) -> None:
+    connection = sqlite3.connect(db_file)
+    for table in SqlAlchemyBase.metadata.sorted_tables:
+        for index in table.indexes:
+            connection.execute(f'DROP INDEX "{index.name}"')
+    connection.close()
+
+
+async def _benchmark(db_file: Path, rows: int, repeats: int) -> None:
+    async_engine = _async_engine(db_file)
+    factory = async_sessionmaker(bind=async_engine, expire_on_commit=False)
+    try:
+        indexed = await _time_lookups(factory, rows, repeats)
+        _drop_indexes(db_file)
+        # Scans are slow, so a handful of repeats is enough
+        unindexed = await _time_lookups(factory, rows, max(repeats // 20, 3))
+    finally:
+        await async_engine.dispose()
+
+    print(f'{"lookup":<30}{"indexed, ms":>14}{"no index, ms":>14}')
+    for name in indexed:
+        print(f'{name:<30}{indexed[name]:>14.3f}{unindexed[name]:>14.3f}')
+
+
+def run(rows: int = BENCHMARK_ROWS, repeats: int = BENCHMARK_REPEATS) -> None:
+    with tempfile.TemporaryDirectory() as directory:
+        db_file = Path(directory) / 'benchmark.sqlite3'
+        _create_schema(db_file)
+
+        started = time.perf_counter()
+        _fill(db_file, rows)
+        print(f'Filled {rows:,} rows per table in {time.perf_counter() - started:.1f} s')
+
+        asyncio.run(_benchmark(db_file, rows, repeats))
+
+
+def _engine(db_file: Path, pragmas: Dict[str, Any]) -> Engine:
+    engine = sa.create_engine(
+        f'sqlite:///{db_file}',
+        connect_args={'check_same_thread': False},
+        poolclass=sa.pool.QueuePool,
+        pool_size=SQLITE_POOL_SIZE,
+        max_overflow=SQLITE_MAX_OVERFLOW,
+    )
+    sa.event.listen(
+        engine,
+        'connect',
+        lambda dbapi_connection, _: set_sqlite_pragmas(dbapi_connection, pragmas=pragmas),
+    )
+    SqlAlchemyBase.metadata.create_all(engine)
+    return engine
+
+
+def _create_schema(db_file: Path) -> None:
+    ''' Sets the file up the way global_init would, without touching its engines. '''
+    engine = _engine(db_file, SQLITE_PRAGMAS)
+    upgrade_schema(engine)
+    engine.dispose()
+
+
+def _async_engine(db_file: Path) -> AsyncEngine:
+    ''' A private aiosqlite engine; the caller disposes of it. '''
+    async_engine = create_async_engine(
+        f'sqlite+aiosqlite:///{db_file}',
+        poolclass=sa.pool.AsyncAdaptedQueuePool,
+        pool_size=SQLITE_POOL_SIZE,
+        max_overflow=SQLITE_MAX_OVERFLOW,
+    )
+    sa.event.listen(async_engine.sync_engine, 'connect', set_sqlite_pragmas)
+    return async_engine
+
+
+def _write_note(factory: orm.sessionmaker, journey_id: int, i: int) -> None:
+    with factory() as db_session:
+        db_session.add(Note(title=f'Note {i}', content='content', journey_id=journey_id))
+        db_session.commit()
+
+
+def _measure_writes(engine: Engine, seconds: float, readers: int) -> Dict[str, float]:
+    ''' Commits per second of one writer and reads per second of `readers` threads. '''
+    factory = orm.sessionmaker(bind=engine)
+    with factory() as db_session:
+        journey = Journey(owner_id=1, title='Benchmark', description='description')
+        db_session.add(journey)
+        db_session.commit()
+        journey_id = journey.id
+
+    writes = 0
+    reads = [0] * readers
+    errors = [0]
+    deadline = time.perf_counter() + seconds
+    stop = threading.Event()
+
+    def read(reader: int) -> None:
+        while not stop.is_set():
+            try:
+                with factory() as db_session:
+                    db_session.execute(
+                        select(Note).filter_by(journey_id=journey_id).limit(20)
+                    ).all()
+                reads[reader] += 1
+            except sa.exc.OperationalError:
+                errors[0] += 1
+
+    threads = [threading.Thread(target=read, args=(i,)) for i in range(readers)]
+    for thread in threads:
+        thread.start()
+    while time.perf_counter() < deadline:
+        try:
+            _write_note(factory, journey_id, writes)
+            writes += 1
+        except sa.exc.OperationalError:
+            errors[0] += 1
+    stop.set()
+    for thread in threads:
+        thread.join()
+    engine.dispose()
+
+    return {
+        'writes/s': writes / seconds,
+        'reads/s': sum(reads) / seconds,
+        'lock errors': errors[0],
+    }
+
+
+def run_writes(seconds: float = WRITE_BENCHMARK_SECONDS) -> None:
+    print(f'{"settings":<18}{"readers":>8}{"writes/s":>12}{"reads/s":>12}{"lock errors":>13}')
+    for name, pragmas in JOURNAL_SETTINGS.items():
+        for readers in (0, WRITE_BENCHMARK_READERS):
+            with tempfile.TemporaryDirectory() as directory:
+                engine = _engine(Path(directory) / 'benchmark.sqlite3', pragmas)
+                result = _measure_writes(engine, seconds, readers)
+            print(
+                f'{name:<18}{readers:>8}{result["writes/s"]:>12.0f}'
+                f'{result["reads/s"]:>12.0f}{result["lock errors"]:>13}'
+            )
+
+
+def _listings() -> Dict[str, Callable[..., Awaitable]]:
+    async def journey_list(db_session, owner_id):
+        journeys = await crud.get_all_user_journeys(
+            db_session, owner_id=owner_id, collections=('locations',)
+        )
+        return [location.place for journey in journeys for location in journey.locations]
+
+    async def journey_list_joined(db_session, owner_id):
+        journeys = await crud.get_all_user_journeys(
+            db_session, owner_id=owner_id, collections=('locations',), strategy='joined'
+        )
+        return [location.place for journey in journeys for location in journey.locations]
+
+    async def journeys_with_notes(db_session, owner_id):
+        journeys = await crud.get_all_user_journeys(db_session, owner_id=owner_id)
+        return [note.title for journey in journeys for note in journey.notes]
+
+    async def journey_titles(db_session, owner_id):
+        journeys = await crud.get_all_user_journeys(db_session, owner_id=owner_id, collections=())
+        return [journey.title for journey in journeys]
+
+    return {
+        'journey list (selectin)': journey_list,
+        'journey list (joined)': journey_list_joined,
+        'journeys with notes': journeys_with_notes,
+        'journey titles': journey_titles,
+    }
+
+
+async def _count_queries(db_file: Path) -> Dict[str, List[int]]:
+    statements = [0]
+
+    def count(*_):
+        statements[0] += 1
+
+    async_engine = _async_engine(db_file)
+    factory = async_sessionmaker(bind=async_engine, expire_on_commit=False)
+    try:
+        async with factory() as db_session:
+            for owner_id in QUERY_COUNT_JOURNEYS:
+                for i in range(owner_id):
+                    journey = Journey(owner_id=owner_id, title=f'Journey {i}', description='d')
+                    journey.locations = [
+                        Location(place=f'Place {j}', date_start=date(2026, 7, 1),
+                                 date_end=date(2026, 7, 5), lat=0, lon=0)
+                        for j in range(3)
+                    ]
+                    journey.notes = [Note(title=f'Note {j}', content='c') for j in range(3)]
+                    db_session.add(journey)
+            await db_session.commit()
+
+        counts = {}
+        sa.event.listen(async_engine.sync_engine, 'before_cursor_execute', count)
+        for name, listing in _listings().items():
+            counts[name] = []
+            for owner_id in QUERY_COUNT_JOURNEYS:
+                statements[0] = 0
+                async with factory() as db_session:
+                    await listing(db_session, owner_id)
+                counts[name].append(statements[0])
+        return counts
+    finally:
+        await async_engine.dispose()
+
+
+def count_queries() -> Dict[str, List[int]]:
+    '''
+    Statements issued per listing, one count per QUERY_COUNT_JOURNEYS entry.
+    Runs on its own engines over a throwaway file, so the database set up
+    by global_init is never written to.
+    '''
+    with tempfile.TemporaryDirectory() as directory:
+        db_file = Path(directory) / 'benchmark.sqlite3'
+        _create_schema(db_file)
+        return asyncio.run(_count_queries(db_file))
+
+
+def run_query_counts() -> None:
+    counts = count_queries()
+    print(f'{"listing":<26}' + ''.join(f'{f"{n} journeys":>14}' for n in QUERY_COUNT_JOURNEYS))
+    mismatches = []
+    for name, listing_counts in counts.items():
+        print(f'{name:<26}' + ''.join(f'{n:>14}' for n in listing_counts))
+        if any(n != EXPECTED_QUERY_COUNTS[name] for n in listing_counts):
+            mismatches.append(name)
+
+    if len(mismatches) > 0:
+        sys.exit(
+            'Unexpected statement counts (expected '
+            + ', '.join(f'{name}: {EXPECTED_QUERY_COUNTS[name]}' for name in mismatches)
+            + ')'
+        )
+
+
+if __name__ == '__main__':
+    if sys.argv[1:2] == ['writes']:
+        run_writes(*map(float, sys.argv[2:3]))
+    elif sys.argv[1:2] == ['queries']:
+        run_query_counts()
+    else:
+        run(*map(int, sys.argv[1:3]))
@@ -1,8 +1,13 @@
 from datetime import date
-from typing import List
+from typing import Iterable, List
 
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload, raiseload, selectinload
+from sqlalchemy.orm.interfaces import LoaderOption
 
+from services.map_cache import invalidate_journey_map
+from .user_cache import invalidate_user
 from .models import (
     Admin,
     Journey,
@@ -11,9 +16,28 @@ from .models import (
     User,
 )
 
+JOURNEY_COLLECTIONS = ('locations', 'notes')
+JOURNEY_LOADERS = {'selectin': selectinload, 'joined': joinedload}
+
+
+def journey_loader_options(
+    collections: Iterable[str] = JOURNEY_COLLECTIONS,
+    strategy: str = 'selectin',
+) -> List[LoaderOption]:
+    '''
+    Eager loading for journey queries. Async sessions cannot lazy-load, so
+    every collection the caller reads must be listed; touching any other
+    raises instead of quietly issuing a query per journey.
+    'selectin' costs one extra query per collection however many journeys
+    are loaded; 'joined' loads everything in the same query, which suits
+    a single journey with one collection.
+    '''
+    loader = JOURNEY_LOADERS[strategy]
+    return [loader(getattr(Journey, name)) for name in collections] + [raiseload('*')]
+
 
 async def create_user(
-    db_session: Session,
+    db_session: AsyncSession,
     username: str,
     telegram_id: int,
     age: int,
@@ -33,21 +57,23 @@ async def create_user(
     )
 
     db_session.add(user)
-    db_session.commit()
-    db_session.refresh(user)
+    await db_session.commit()
+    await db_session.refresh(user)
+    invalidate_user(telegram_id=telegram_id)
 
     return user
 
 
 async def get_user_by_telegram_userid(
-    db_session: Session,
+    db_session: AsyncSession,
     telegram_id: int,
 ) -> User | None:
-    return db_session.query(User).filter_by(telegram_userid=telegram_id).one_or_none()
+    result = await db_session.execute(select(User).filter_by(telegram_userid=telegram_id))
+    return result.scalar_one_or_none()
 
 
 async def update_user(
-    db_session: Session,
+    db_session: AsyncSession,
     id: int,
     new_age: int | None = None,
     new_living_location: str | None = None,
@@ -55,7 +81,7 @@ async def update_user(
     new_lon: float | None = None,
     new_bio: str | None = None,
 ):
-    user: User = db_session.query(User).get(id)
+    user: User = await db_session.get(User, id)
     if new_age is not None:
         user.age = new_age
     if new_living_location is not None:
@@ -67,11 +93,12 @@ async def update_user(
     if new_bio is not None:
         user.bio = new_bio
 
-    db_session.commit()
+    await db_session.commit()
+    invalidate_user(telegram_id=user.telegram_userid)
 
 
 async def create_journey(
-    db_session: Session,
+    db_session: AsyncSession,
     owner_id: int,
     title: str,
     description: str,
@@ -79,46 +106,65 @@ async def create_journey(
     journey = Journey(owner_id=owner_id, title=title, description=description)
 
     db_session.add(journey)
-    db_session.commit()
-    db_session.refresh(journey)
+    await db_session.commit()
+    await db_session.refresh(journey, attribute_names=['id', 'locations', 'notes'])
 
     return journey
 
 
 async def get_all_journeys(
-    db_session: Session,
+    db_session: AsyncSession,
+    collections: Iterable[str] = JOURNEY_COLLECTIONS,
+    strategy: str = 'selectin',
 ) -> List[Journey]:
-    return db_session.query(Journey).all()
+    result = await db_session.execute(
+        select(Journey).options(*journey_loader_options(collections, strategy))
+    )
+    return list(result.unique().scalars().all())
 
 
 async def get_all_user_journeys(
-    db_session: Session,
+    db_session: AsyncSession,
     owner_id: int,
+    collections: Iterable[str] = JOURNEY_COLLECTIONS,
+    strategy: str = 'selectin',
 ) -> List[Journey]:
-    return db_session.query(Journey).filter_by(owner_id=owner_id).all()
+    result = await db_session.execute(
+        select(Journey)
+        .filter_by(owner_id=owner_id)
+        .options(*journey_loader_options(collections, strategy))
+    )
+    return list(result.unique().scalars().all())
 
 
 async def get_journey_by_title(
-    db_session: Session,
+    db_session: AsyncSession,
     owner_id: int,
     journey_title: str,
+    collections: Iterable[str] = JOURNEY_COLLECTIONS,
+    strategy: str = 'selectin',
 ) -> Journey | None:
-    return (
-        db_session.query(Journey)
+    result = await db_session.execute(
+        select(Journey)
         .filter_by(title=journey_title, owner_id=owner_id)
-        .one_or_none()
+        .options(*journey_loader_options(collections, strategy))
     )
+    return result.unique().scalar_one_or_none()
 
 
 async def get_journey_by_id(
-    db_session: Session,
+    db_session: AsyncSession,
     journey_id: int,
+    collections: Iterable[str] = JOURNEY_COLLECTIONS,
+    strategy: str = 'selectin',
 ) -> Journey | None:
-    return db_session.query(Journey).get(journey_id)
+    return await db_session.get(
+        Journey, journey_id, options=journey_loader_options(collections, strategy)
+    )
 
 
 async def update_journey(
-    db_session: Session,
+    db_session: AsyncSession,
     journey: Journey,
     new_title: str | None = None,
     new_description: str | None = None,
@@ -128,19 +174,20 @@ async def update_journey(
     if new_description is not None:
         journey.description = new_description
 
-    db_session.commit()
+    await db_session.commit()
 
 
 async def delete_journey(
-    db_session: Session,
+    db_session: AsyncSession,
     journey: Journey,
 ) -> None:
-    db_session.delete(journey)
-    db_session.commit()
+    await db_session.delete(journey)
+    await db_session.commit()
+    invalidate_journey_map(journey_id=journey.id)
 
 
 async def create_location(
-    db_session: Session,
+    db_session: AsyncSession,
     place: str,
     date_start: date,
     date_end: date,
@@ -159,30 +206,30 @@ async def create_location(
     journey.locations.append(location)
 
     db_session.add(location)
-    db_session.commit()
-    db_session.refresh(location)
+    await db_session.commit()
+    await db_session.refresh(location)
+    invalidate_journey_map(journey_id=journey.id)
 
     return location
 
 
 async def get_location_by_journey_place_datestart_dateend(
-    db_session: Session,
+    db_session: AsyncSession,
     journey: Journey,
     place: str,
     date_start: date,
     date_end: date,
 ) -> Location | None:
-    return (
-        db_session.query(Location)
-        .filter_by(
+    result = await db_session.execute(
+        select(Location).filter_by(
             place=place, date_start=date_start, date_end=date_end, journey_id=journey.id
         )
-        .one_or_none()
     )
+    return result.scalar_one_or_none()
 
 
 async def update_location(
-    db_session: Session,
+    db_session: AsyncSession,
     location: Location,
     new_place: str | None = None,
     new_date_start: date | None = None,
@@ -201,21 +248,23 @@ async def update_location(
     if new_lon is not None:
         location.lon = new_lon
 
-    db_session.commit()
+    await db_session.commit()
+    invalidate_journey_map(journey_id=location.journey_id)
 
 
 async def delete_location_from_journey(
-    db_session: Session,
+    db_session: AsyncSession,
     journey: Journey,
     location: Location,
 ) -> None:
     journey.locations.remove(location)
-    db_session.delete(location)
-    db_session.commit()
+    await db_session.delete(location)
+    await db_session.commit()
+    invalidate_journey_map(journey_id=journey.id)
 
 
 async def create_note(
-    db_session: Session, title: str, content: str, journey: Journey
+    db_session: AsyncSession, title: str, content: str, journey: Journey
 ) -> Note:
     note = Note(
         title=title,
@@ -225,14 +274,14 @@ async def create_note(
     journey.notes.append(note)
 
     db_session.add(note)
-    db_session.commit()
-    db_session.refresh(note)
+    await db_session.commit()
+    await db_session.refresh(note)
 
     return note
 
 
 async def update_note(
-    db_session: Session,
+    db_session: AsyncSession,
     note: Note,
     new_title: str | None = None,
     new_content: str | None = None,
@@ -242,15 +291,22 @@ async def update_note(
     if new_content is not None:
         note.content = new_content
 
-    db_session.commit()
+    await db_session.commit()
 
 
 async def delete_note(
-    db_session: Session,
+    db_session: AsyncSession,
     note: Note,
 ) -> None:
-    db_session.delete(note)
-    db_session.commit()
+    await db_session.delete(note)
+    await db_session.commit()
+
+
+async def get_note_by_id(
+    db_session: AsyncSession,
+    note_id: int,
+) -> Note | None:
+    return await db_session.get(Note, note_id)
 
 
 async def get_note_by_title(
@@ -1,14 +1,37 @@
+from typing import Any, Dict
+import weakref
+
 import sqlalchemy as sa
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 import sqlalchemy.orm as orm
 from sqlalchemy.orm import Session
 
 SqlAlchemyBase = orm.declarative_base()
 
+# Applied to every new connection. WAL lets the admin panel read while the
+# bot writes; with it, synchronous=NORMAL only fsyncs at checkpoints
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    # Milliseconds to wait for a lock; this replaces the driver's `timeout`
+    'busy_timeout': 5_000,
+    'cache_size': -64_000,
+    'mmap_size': 256 * 1024 * 1024,
+    'temp_store': 'MEMORY',
+}
+SQLITE_POOL_SIZE = 5
+SQLITE_MAX_OVERFLOW = 10
+
 __factory = None
+__async_engine = None
+__async_factory = None
+__scoped_session = None
+# Every session handed out, so leaks show up in identity_map_stats()
+__live_sessions: 'weakref.WeakSet[Session]' = weakref.WeakSet()
 
 
 def global_init(db_file):
-    global __factory
+    global __factory, __async_engine, __async_factory, __scoped_session
 
     if __factory:
         return
@@ -16,15 +39,85 @@ def global_init(db_file):
     if not db_file or not db_file.strip():
         raise Exception('No file has been specified')
 
-    conn_str = f'sqlite:///{db_file.strip()}?check_same_thread=False'
+    conn_str = f'sqlite:///{db_file.strip()}'
     # print(f'Подключение к базе данных по адресу {conn_str}')
 
-    engine = sa.create_engine(conn_str, echo=False)
+    engine = sa.create_engine(
+        conn_str,
+        echo=False,
+        connect_args={'check_same_thread': False},
+        poolclass=sa.pool.QueuePool,
+        pool_size=SQLITE_POOL_SIZE,
+        max_overflow=SQLITE_MAX_OVERFLOW,
+    )
+    sa.event.listen(engine, 'connect', set_sqlite_pragmas)
     __factory = orm.sessionmaker(bind=engine)
+    __scoped_session = orm.scoped_session(create_session)
 
     SqlAlchemyBase.metadata.create_all(engine)
 
+    from .migrations import upgrade_schema
+    upgrade_schema(engine)
+
+    # The bot talks to the same file through aiosqlite. Objects stay usable
+    # after commit, since an async session cannot lazily refresh them
+    __async_engine = create_async_engine(
+        f'sqlite+aiosqlite:///{db_file.strip()}',
+        echo=False,
+        # aiosqlite defaults to NullPool, which opens a connection per session
+        poolclass=sa.pool.AsyncAdaptedQueuePool,
+        pool_size=SQLITE_POOL_SIZE,
+        max_overflow=SQLITE_MAX_OVERFLOW,
+    )
+    sa.event.listen(__async_engine.sync_engine, 'connect', set_sqlite_pragmas)
+    __async_factory = async_sessionmaker(bind=__async_engine, expire_on_commit=False)
+
+
+def set_sqlite_pragmas(
+    dbapi_connection: Any,
+    connection_record: Any = None,
+    pragmas: Dict[str, Any] = SQLITE_PRAGMAS,
+) -> None:
+    cursor = dbapi_connection.cursor()
+    for name, value in pragmas.items():
+        cursor.execute(f'PRAGMA {name} = {value}')
+    cursor.close()
+
 
 def create_session() -> Session:
     global __factory
-    return __factory()
+    session = __factory()
+    __live_sessions.add(session)
+    return session
+
+
+def create_async_session() -> AsyncSession:
+    global __async_factory
+    session = __async_factory()
+    __live_sessions.add(session.sync_session)
+    return session
+
+
+async def dispose_async_engine() -> None:
+    ''' Closes the pooled aiosqlite connections; their threads would keep the process alive. '''
+    global __async_engine
+    if __async_engine is not None:
+        await __async_engine.dispose()
+
+
+def scoped_session() -> orm.scoped_session:
+    '''
+    Thread-local session registry. Whoever uses it must call `.remove()`
+    when the request is over, so its identity map is dropped.
+    '''
+    global __scoped_session
+    return __scoped_session
+
+
+def identity_map_stats() -> Dict[str, int]:
+    ''' Number of live sessions and ORM objects held in their identity maps. '''
+    sessions = list(__live_sessions)
+    return {
+        'sessions': len(sessions),
+        'objects': sum(len(session.identity_map) for session in sessions),
+    }
@@ -0,0 +1,156 @@
+'''
+Disk-backed FSM storage for the dispatcher.
+
+State survives restarts and does not pile up in memory. Data is stored as
+compact JSON, so handlers may only keep plain values and primary keys in
+it; ORM objects are rejected and must be re-fetched when needed.
+
+Conversations nobody finishes are dropped after FSM_STATE_TTL without a
+write, and the table is capped at MAX_FSM_ENTRIES, oldest first. Expired
+entries read as empty right away and are deleted by a periodic sweep.
+'''
+import asyncio
+import json
+import logging
+import time
+from typing import Any, Dict, Optional
+
+import aiosqlite
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, StateType, StorageKey
+
+FSM_STATE_TTL = 24 * 3600
+MAX_FSM_ENTRIES = 100_000
+FSM_SWEEP_INTERVAL = 600
+
+
+class SQLiteStorage(BaseStorage):
+    def __init__(
+        self,
+        path: str,
+        state_ttl: float = FSM_STATE_TTL,
+        max_entries: int = MAX_FSM_ENTRIES,
+        sweep_interval: float = FSM_SWEEP_INTERVAL,
+    ) -> None:
+        self.path = path
+        self.state_ttl = state_ttl
+        self.max_entries = max_entries
+        self.sweep_interval = sweep_interval
+        self._connection: aiosqlite.Connection | None = None
+        self._connect_lock = asyncio.Lock()
+        self._sweeper: asyncio.Task | None = None
+
+    async def _connect(self) -> aiosqlite.Connection:
+        async with self._connect_lock:
+            if self._connection is None:
+                connection = await aiosqlite.connect(self.path)
+                await connection.executescript('''
+                    PRAGMA journal_mode = WAL;
+                    PRAGMA synchronous = NORMAL;
+                    CREATE TABLE IF NOT EXISTS fsm (
+                        key TEXT PRIMARY KEY,
+                        state TEXT,
+                        data TEXT,
+                        updated_at REAL NOT NULL
+                    );
+                    CREATE INDEX IF NOT EXISTS ix_fsm_updated_at ON fsm (updated_at);
+                ''')
+                self._connection = connection
+        return self._connection
+
+    @staticmethod
+    def _key(key: StorageKey) -> str:
+        return f'{key.bot_id}:{key.chat_id}:{key.user_id}:{key.thread_id or 0}:{key.destiny}'
+
+    async def _write(self, key: StorageKey, column: str, value: str | None) -> None:
+        connection = await self._connect()
+        storage_key = self._key(key)
+        # An expired entry must not bring its other column back to life
+        await connection.execute(
+            'DELETE FROM fsm WHERE key = ? AND updated_at <= ?',
+            (storage_key, time.time() - self.state_ttl),
+        )
+        await connection.execute(
+            f'INSERT INTO fsm (key, {column}, updated_at) VALUES (?, ?, ?) '
+            f'ON CONFLICT (key) DO UPDATE SET {column} = excluded.{column}, '
+            'updated_at = excluded.updated_at',
+            (storage_key, value, time.time()),
+        )
+        # Finished or cleared conversations leave nothing behind
+        await connection.execute(
+            'DELETE FROM fsm WHERE key = ? AND state IS NULL AND data IS NULL', (storage_key,)
+        )
+        await connection.commit()
+
+    async def _read(self, key: StorageKey, column: str) -> str | None:
+        connection = await self._connect()
+        async with connection.execute(
+            f'SELECT {column} FROM fsm WHERE key = ? AND updated_at > ?',
+            (self._key(key), time.time() - self.state_ttl),
+        ) as cursor:
+            row = await cursor.fetchone()
+        return None if row is None else row[0]
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        await self._write(key, 'state', state.state if isinstance(state, State) else state)
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        return await self._read(key, 'state')
+
+    async def set_data(self, key: StorageKey, data: Dict[str, Any]) -> None:
+        payload = json.dumps(data, separators=(',', ':'), ensure_ascii=False) if data else None
+        await self._write(key, 'data', payload)
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        payload = await self._read(key, 'data')
+        return {} if payload is None else json.loads(payload)
+
+    async def sweep(self) -> int:
+        ''' Deletes expired entries, then the oldest ones over the cap. Returns the number deleted. '''
+        connection = await self._connect()
+        expired = await connection.execute(
+            'DELETE FROM fsm WHERE updated_at <= ?', (time.time() - self.state_ttl,)
+        )
+        overflow = await connection.execute(
+            'DELETE FROM fsm WHERE key IN '
+            '(SELECT key FROM fsm ORDER BY updated_at DESC LIMIT -1 OFFSET ?)',
+            (self.max_entries,),
+        )
+        await connection.commit()
+        return expired.rowcount + overflow.rowcount
+
+    async def stats(self) -> Dict[str, int]:
+        ''' Number of stored conversations and their approximate size in bytes. '''
+        connection = await self._connect()
+        async with connection.execute(
+            'SELECT count(*), coalesce(sum(length(CAST(key AS BLOB)) '
+            '+ coalesce(length(CAST(state AS BLOB)), 0) '
+            '+ coalesce(length(CAST(data AS BLOB)), 0)), 0) FROM fsm'
+        ) as cursor:
+            entries, size = await cursor.fetchone()
+        return {'entries': entries, 'bytes': size}
+
+    async def _sweep_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            try:
+                evicted = await self.sweep()
+                logging.info('FSM storage: evicted %d, now %s', evicted, await self.stats())
+            except Exception as e:
+                logging.warning('FSM storage sweep failed: %r', e)
+
+    async def start_sweeper(self) -> None:
+        if self._sweeper is None:
+            self._sweeper = asyncio.create_task(self._sweep_periodically())
+
+    async def close(self) -> None:
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+            try:
+                await self._sweeper
+            except asyncio.CancelledError:
+                pass
+            self._sweeper = None
+        if self._connection is not None:
+            await self._connection.close()
+            self._connection = None
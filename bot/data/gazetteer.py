@@ -0,0 +1,113 @@
+'''
+Offline city gazetteer used in front of the remote geocoder.
+
+cities.tsv holds one row per (normalized name, city):
+    key \\t name \\t country \\t lat \\t lon \\t population
+Alternate names are stored as extra rows pointing at the same city.
+The file is memory-mapped and only a sorted key -> offset index is kept
+in memory; rows are parsed on demand.
+
+The gazetteer is opt-in: set GAZETTEER_ENABLED=1 in the environment.
+Matched places are then stored as "City, Country" instead of the remote
+geocoder's full display name.
+'''
+from array import array
+from bisect import bisect_left
+import mmap
+import os
+from pathlib import Path
+from typing import List, Tuple
+import unicodedata
+
+GAZETTEER_ENABLED = os.environ.get('GAZETTEER_ENABLED', '').lower() in ('1', 'true', 'yes')
+GAZETTEER_FILE = Path(__file__).parent / 'cities.tsv'
+
+# (display_name, lat, lon, population)
+GazetteerEntry = Tuple[str, float, float, int]
+
+__data: mmap.mmap | None = None
+__keys: List[str] = []
+__offsets = array('Q')
+
+
+def normalize_name(name: str) -> str:
+    name = unicodedata.normalize('NFKD', ' '.join(name.split()).casefold())
+    return ''.join(char for char in name if not unicodedata.combining(char))
+
+
+def _load() -> None:
+    global __data, __keys, __offsets
+
+    with open(GAZETTEER_FILE, 'rb') as file:
+        data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    index = []
+    offset = 0
+    size = len(data)
+    while offset < size:
+        end = data.find(b'\n', offset)
+        if end == -1:
+            end = size
+        key_end = data.find(b'\t', offset, end)
+        if key_end != -1:
+            index.append((data[offset:key_end].decode('utf-8'), offset))
+        offset = end + 1
+    index.sort()
+
+    __keys = [key for key, _ in index]
+    __offsets = array('Q', (offset for _, offset in index))
+    __data = data
+
+
+def _read_row(position: int) -> Tuple[str, str, str, float, float, int]:
+    offset = __offsets[position]
+    end = __data.find(b'\n', offset)
+    if end == -1:
+        end = len(__data)
+    key, name, country, lat, lon, population = __data[offset:end].decode('utf-8').split('\t')
+    return key, name, country, float(lat), float(lon), int(population)
+
+
+def _rows_with_prefix(prefix: str):
+    if __data is None:
+        _load()
+
+    position = bisect_left(__keys, prefix)
+    while position < len(__keys) and __keys[position].startswith(prefix):
+        yield _read_row(position)
+        position += 1
+
+
+def lookup_city(query: str) -> GazetteerEntry | None:
+    '''
+    Resolves an exact city name (or alternate name), optionally followed
+    by ", <country>". Picks the most populous match.
+    '''
+    name, _, country = query.partition(',')
+    key = normalize_name(name)
+    country = normalize_name(country)
+    if not key:
+        return None
+
+    best = None
+    for row_key, row_name, row_country, lat, lon, population in _rows_with_prefix(key):
+        if row_key != key:
+            break
+        if country and normalize_name(row_country) != country:
+            continue
+        if best is None or population > best[3]:
+            best = (f'{row_name}, {row_country}', lat, lon, population)
+    return best
+
+
+def complete_city(prefix: str, limit: int = 5) -> List[GazetteerEntry]:
+    ''' The most populous cities whose name starts with `prefix`. '''
+    key = normalize_name(prefix)
+    if not key:
+        return []
+
+    entries = {}
+    for _, row_name, row_country, lat, lon, population in _rows_with_prefix(key):
+        display_name = f'{row_name}, {row_country}'
+        entries[display_name] = (display_name, lat, lon, population)
+    return sorted(entries.values(), key=lambda entry: -entry[3])[:limit]
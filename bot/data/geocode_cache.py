@@ -0,0 +1,86 @@
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Dict, Tuple
+
+from sqlalchemy.dialects.sqlite import insert
+
+from .db_session import create_async_session
+from .models import GeocodeCache
+
+# (display_name, lat, lon); all None for a negative ("not found") entry
+GeocodeResult = Tuple[str | None, float | None, float | None]
+
+MEMORY_CACHE_SIZE = 1024
+FOUND_TTL = timedelta(days=30)
+NOT_FOUND_TTL = timedelta(days=1)
+
+geocode_cache_stats: Dict[str, int] = {
+    'memory_hits': 0,
+    'db_hits': 0,
+    'misses': 0,
+}
+
+__memory_cache: 'OrderedDict[str, Tuple[datetime, GeocodeResult]]' = OrderedDict()
+
+
+def normalize_query(query: str) -> str:
+    return ' '.join(query.split()).casefold()
+
+
+def _remember(key: str, expires_at: datetime, result: GeocodeResult) -> None:
+    __memory_cache[key] = (expires_at, result)
+    __memory_cache.move_to_end(key)
+    while len(__memory_cache) > MEMORY_CACHE_SIZE:
+        __memory_cache.popitem(last=False)
+
+
+async def get_cached_geocode(query: str) -> GeocodeResult | None:
+    '''
+    Looks the query up in the in-process LRU, then in the geocode_cache
+    table through the async engine. Returns None on a miss or an expired
+    entry.
+    '''
+    key = normalize_query(query)
+    now = datetime.now()
+
+    cached = __memory_cache.get(key)
+    if cached is not None:
+        expires_at, result = cached
+        if expires_at > now:
+            __memory_cache.move_to_end(key)
+            geocode_cache_stats['memory_hits'] += 1
+            return result
+        del __memory_cache[key]
+
+    async with create_async_session() as db_session:
+        entry = await db_session.get(GeocodeCache, key)
+    if entry is not None and entry.expires_at > now:
+        result = (entry.display_name, entry.lat, entry.lon)
+        _remember(key, entry.expires_at, result)
+        geocode_cache_stats['db_hits'] += 1
+        return result
+
+    geocode_cache_stats['misses'] += 1
+    return None
+
+
+async def cache_geocode(query: str, result: GeocodeResult) -> None:
+    key = normalize_query(query)
+    ttl = FOUND_TTL if result[0] is not None else NOT_FOUND_TTL
+    expires_at = datetime.now() + ttl
+
+    _remember(key, expires_at, result)
+
+    display_name, lat, lon = result
+    values = {
+        'display_name': display_name,
+        'lat': lat,
+        'lon': lon,
+        'expires_at': expires_at,
+    }
+    # A single upsert, so two lookups caching the same place cannot collide
+    statement = insert(GeocodeCache).values(query=key, **values)
+    statement = statement.on_conflict_do_update(index_elements=['query'], set_=values)
+    async with create_async_session() as db_session:
+        await db_session.execute(statement)
+        await db_session.commit()
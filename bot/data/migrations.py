@@ -0,0 +1,101 @@
+'''
+In-place schema upgrades for existing database files.
+
+create_all() only creates missing tables, so databases made by older
+versions of the bot are brought up to date here: missing indexes are
+added, and the journey table is rebuilt once to drop the global UNIQUE
+on its title in favour of the per-owner unique index. Older versions let
+notes be renamed to a title their journey already had, so such duplicates
+get a numbered suffix before the per-journey unique index is created.
+'''
+import logging
+from typing import List
+
+import sqlalchemy as sa
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.schema import CreateTable
+
+from .db_session import SqlAlchemyBase
+
+
+def _unique_constraint_columns(connection: Connection, table_name: str) -> List[List[str]]:
+    ''' Columns of every UNIQUE constraint declared inline in CREATE TABLE. '''
+    constraints = []
+    for _, index_name, _, origin, _ in connection.exec_driver_sql(
+        f'PRAGMA index_list("{table_name}")'
+    ):
+        if origin != 'u':
+            continue
+        columns = [
+            row[2] for row in connection.exec_driver_sql(f'PRAGMA index_info("{index_name}")')
+        ]
+        constraints.append(columns)
+    return constraints
+
+
+def _rebuild_table(connection: Connection, table: sa.Table) -> None:
+    ''' Recreates `table` from the current model and copies its rows over. '''
+    new_name = f'{table.name}__new'
+    new_table = table.to_metadata(sa.MetaData(), name=new_name)
+    columns = ', '.join(f'"{column.name}"' for column in table.columns)
+
+    connection.execute(CreateTable(new_table))
+    connection.exec_driver_sql(
+        f'INSERT INTO "{new_name}" ({columns}) SELECT {columns} FROM "{table.name}"'
+    )
+    connection.exec_driver_sql(f'DROP TABLE "{table.name}"')
+    connection.exec_driver_sql(f'ALTER TABLE "{new_name}" RENAME TO "{table.name}"')
+
+
+def _dedupe_note_titles(connection: Connection) -> None:
+    ''' Renames all but the first of each journey's same-titled notes to "<title> (n)". '''
+    duplicates = connection.exec_driver_sql(
+        'SELECT id, journey_id, title FROM note WHERE (journey_id, title) IN '
+        '(SELECT journey_id, title FROM note GROUP BY journey_id, title HAVING count(*) > 1) '
+        'ORDER BY journey_id, title, id'
+    ).all()
+    if len(duplicates) == 0:
+        return
+
+    seen = set()
+    for note_id, journey_id, title in duplicates:
+        if (journey_id, title) not in seen:
+            seen.add((journey_id, title))
+            continue
+
+        taken = set(connection.exec_driver_sql(
+            'SELECT title FROM note WHERE journey_id = ?', (journey_id,)
+        ).scalars())
+        number = 2
+        while f'{title} ({number})' in taken:
+            number += 1
+        new_title = f'{title} ({number})'
+        logging.warning('Renaming note %d with a duplicate title: %r -> %r', note_id, title, new_title)
+        connection.exec_driver_sql('UPDATE note SET title = ? WHERE id = ?', (new_title, note_id))
+
+
+def upgrade_schema(engine: Engine) -> None:
+    journey = SqlAlchemyBase.metadata.tables['journey']
+
+    with engine.connect() as connection:
+        needs_rebuild = ['title'] in _unique_constraint_columns(connection, journey.name)
+        foreign_keys = connection.exec_driver_sql('PRAGMA foreign_keys').scalar()
+        connection.commit()
+
+        if needs_rebuild:
+            logging.info('Migrating journey: title is now unique per owner')
+            # Other tables reference journey by name, so they must not be
+            # rewritten while the old table is dropped and replaced
+            connection.exec_driver_sql('PRAGMA foreign_keys = OFF')
+            # pysqlite does not open a transaction for DDL by itself
+            connection.exec_driver_sql('BEGIN')
+            _rebuild_table(connection, journey)
+            connection.commit()
+            connection.exec_driver_sql(f'PRAGMA foreign_keys = {foreign_keys}')
+            connection.commit()
+
+    with engine.begin() as connection:
+        _dedupe_note_titles(connection)
+        for table in SqlAlchemyBase.metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(connection, checkfirst=True)
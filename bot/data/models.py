@@ -1,6 +1,6 @@
 from flask_login import UserMixin
 
-from sqlalchemy import Column, ForeignKey, Integer, String, Date, Float
+from sqlalchemy import Column, ForeignKey, Index, Integer, String, Date, DateTime, Float
 from sqlalchemy.orm import relationship
 
 from .db_session import SqlAlchemyBase
@@ -21,7 +21,7 @@ class User(SqlAlchemyBase):
     __tablename__ = 'users'
 
     id = Column(Integer, primary_key=True, autoincrement=True)
-    telegram_userid = Column(Integer, nullable=False)
+    telegram_userid = Column(Integer, nullable=False, index=True)
     username = Column(String(32), unique=True, nullable=False)
     age = Column(Integer, nullable=False)
     living_location = Column(String, nullable=False)
@@ -35,10 +35,12 @@ class User(SqlAlchemyBase):
 
 class Journey(SqlAlchemyBase):
     __tablename__ = 'journey'
+    # Titles are unique per owner; the index also serves owner_id lookups
+    __table_args__ = (Index('ix_journey_owner_id_title', 'owner_id', 'title', unique=True),)
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     owner_id = Column(Integer, nullable=False)
-    title = Column(String(50), unique=True, nullable=False)
+    title = Column(String(50), nullable=False)
     description = Column(String(100), nullable=False)
 
     locations = relationship(
@@ -57,13 +59,15 @@ class Location(SqlAlchemyBase):
     lat = Column(Float, nullable=False)
     lon = Column(Float, nullable=False)
 
-    journey_id = Column(Integer, ForeignKey('journey.id'))
+    journey_id = Column(Integer, ForeignKey('journey.id'), index=True)
 
     journey = relationship('Journey', back_populates='locations')
 
 
 class Note(SqlAlchemyBase):
     __tablename__ = 'note'
+    # Titles are unique per journey; the index also serves journey_id lookups
+    __table_args__ = (Index('ix_note_journey_id_title', 'journey_id', 'title', unique=True),)
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     title = Column(String(50), nullable=False)
@@ -71,3 +75,13 @@ class Note(SqlAlchemyBase):
     journey_id = Column(Integer, ForeignKey('journey.id'))
 
     journey = relationship('Journey', back_populates='notes')
+
+
+class GeocodeCache(SqlAlchemyBase):
+    __tablename__ = 'geocode_cache'
+
+    query = Column(String, primary_key=True)
+    display_name = Column(String, nullable=True)
+    lat = Column(Float, nullable=True)
+    lon = Column(Float, nullable=True)
+    expires_at = Column(DateTime, nullable=False)
@@ -0,0 +1,49 @@
+'''
+Bounded TTL cache of bot users keyed by Telegram id.
+
+Entries are detached User objects, safe to read but never added back to a
+session. Unknown Telegram ids are cached too, so repeated messages from
+someone who has not signed up do not hit the database either. create_user
+and update_user drop the affected entry.
+'''
+from collections import OrderedDict
+import time
+from typing import Dict, Tuple
+
+from .models import User
+
+USER_CACHE_SIZE = 10_000
+USER_CACHE_TTL = 300
+
+user_cache_stats: Dict[str, int] = {
+    'hits': 0,
+    'misses': 0,
+}
+
+__users: 'OrderedDict[int, Tuple[float, User | None]]' = OrderedDict()
+
+
+def get_cached_user(telegram_id: int) -> Tuple[bool, User | None]:
+    ''' Returns (found, user); user is None for a cached "not signed up". '''
+    cached = __users.get(telegram_id)
+    if cached is not None:
+        stored_at, user = cached
+        if time.monotonic() - stored_at <= USER_CACHE_TTL:
+            __users.move_to_end(telegram_id)
+            user_cache_stats['hits'] += 1
+            return True, user
+        del __users[telegram_id]
+
+    user_cache_stats['misses'] += 1
+    return False, None
+
+
+def cache_user(telegram_id: int, user: User | None) -> None:
+    __users[telegram_id] = (time.monotonic(), user)
+    __users.move_to_end(telegram_id)
+    while len(__users) > USER_CACHE_SIZE:
+        __users.popitem(last=False)
+
+
+def invalidate_user(telegram_id: int) -> None:
+    __users.pop(telegram_id, None)
@@ -1,11 +1,26 @@
 from datetime import date
-import requests
 from typing import Tuple
 
+from services.http import fetch_json, upstream_semaphore
+from .gazetteer import GAZETTEER_ENABLED, lookup_city
+from .geocode_cache import cache_geocode, get_cached_geocode
+
 
 async def validate_location(
     city: str,
 ) -> Tuple[bool, int, str | None, int | None, int | None]:
+    if GAZETTEER_ENABLED:
+        entry = lookup_city(city)
+        if entry is not None:
+            display_name, lat, lon, _ = entry
+            return True, 200, display_name, lat, lon
+
+    cached = await get_cached_geocode(city)
+    if cached is not None:
+        display_name, lat, lon = cached
+        return display_name is not None, 200, display_name, lat, lon
+
+    query = city
     city = city.capitalize()
 
     base_url = 'https://nominatim.openstreetmap.org/search'
@@ -16,25 +31,25 @@ async def validate_location(
 
     headers = {
         'accept-language': 'en-US',
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/111.0.0.0 Safari/537.36'
     }
 
-    response = requests.get(base_url, params=params, headers=headers)
+    async with upstream_semaphore('nominatim'):
+        status_code, locations = await fetch_json(
+            base_url, params=params, headers=headers, timeout=10
+        )
 
-    if response.status_code != 200:
-        return False, response.status_code, None
+    if status_code != 200 or locations is None:
+        return False, status_code, None, None, None
 
-    # locations = [it for it in response.json() if it['addresstype'] == 'city']
-    locations = response.json()
+    # locations = [it for it in locations if it['addresstype'] == 'city']
     if len(locations) == 0:
-        return False, response.status_code, None
-    return (
-        True,
-        response.status_code,
-        locations[0]['display_name'],
-        float(locations[0]['lat']),
-        float(locations[0]['lon']),
-    )
+        await cache_geocode(query, (None, None, None))
+        return False, status_code, None, None, None
+
+    display_name = locations[0]['display_name']
+    lat, lon = float(locations[0]['lat']), float(locations[0]['lon'])
+    await cache_geocode(query, (display_name, lat, lon))
+    return True, status_code, display_name, lat, lon
 
 
 async def validate_date(dtstr: str) -> bool:
@@ -0,0 +1,29 @@
+import logging
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+
+from data.db_session import create_async_session, identity_map_stats
+
+
+class DbSessionMiddleware(BaseMiddleware):
+    '''
+    Opens a short-lived database session for every incoming update and
+    hands it to the handlers as `db_session`. Closing it drops everything
+    it loaded, so the identity map never outlives an update.
+    '''
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        try:
+            async with create_async_session() as db_session:
+                data['db_session'] = db_session
+                return await handler(event, data)
+        finally:
+            if logging.getLogger().isEnabledFor(logging.DEBUG):
+                logging.debug('Identity map after update: %s', identity_map_stats())
@@ -0,0 +1,35 @@
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+
+from data.crud import get_user_by_telegram_userid
+from data.user_cache import cache_user, get_cached_user
+
+
+class UserMiddleware(BaseMiddleware):
+    '''
+    Resolves the bot user behind an update once, through the user cache,
+    and hands it to the handlers as `user` (None if not signed up).
+    Must run after DbSessionMiddleware.
+    '''
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        from_user = data.get('event_from_user')
+        if from_user is None:
+            return await handler(event, data)
+
+        found, user = get_cached_user(from_user.id)
+        if not found:
+            user = await get_user_by_telegram_userid(
+                db_session=data['db_session'], telegram_id=from_user.id
+            )
+            cache_user(from_user.id, user)
+
+        data['user'] = user
+        return await handler(event, data)
@@ -1,28 +1,22 @@
 from datetime import date
-import os
-from pprint import pprint
-from typing import Dict, List, Tuple
+from typing import List, Tuple
 
 from aiogram import Router
+from aiogram.exceptions import TelegramBadRequest
 from aiogram.filters import Command
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
-from aiogram.types import Message, FSInputFile
+from aiogram.types import BufferedInputFile, Message
 from aiogram.utils.markdown import hitalic
-import openmeteo_requests
-import pandas as pd
-import requests
-import requests_cache
-from retry_requests import retry
-from staticmap import Line, StaticMap, CircleMarker
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from data.crud import (
     create_journey,
     create_location,
     get_all_user_journeys,
+    get_journey_by_id,
     get_journey_by_title,
     get_location_by_journey_place_datestart_dateend,
-    get_user_by_telegram_userid,
     delete_journey,
     delete_location_from_journey,
     update_journey,
@@ -30,6 +24,11 @@ from data.crud import (
 )
 from data.models import Location, User
 from data.validators import validate_location, validate_date
+from services.overpass import fetch_pois_near_points
+from services.map_cache import get_map_file_id, invalidate_journey_map, remember_map_file_id
+from services.maps import render_map
+from services.routing import fetch_route
+from services.weather import fetch_journey_weather
 from ux.keyboards import (
     DEFAULT_KEYBOARD,
     EDIT_JOURNEY_PARAMS_KEYBOARD,
@@ -38,210 +37,82 @@ from ux.keyboards import (
     journey_list_keyboard,
     journey_location_list_keyboard,
 )
-from ux.typical_answers import DATE_CONFLICTS_WITH_ANOTHER_DATE
-from settings import ROOT, session
-
-cache_session = requests_cache.CachedSession('temp_files/.cache', expire_after = 3600)
-retry_session = retry(cache_session, retries = 5, backoff_factor = 0.2)
-openmeteo = openmeteo_requests.Client(session = retry_session)
-
-user_agent_headers = {
-    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/111.0.0.0 Safari/537.36'
-}
+from ux.typical_answers import DATE_CONFLICTS_WITH_ANOTHER_DATE, JOURNEY_NO_LONGER_EXISTS
 
 def datestr_to_date(datestr: str) -> date:
     year, month, day = map(int, datestr.split('-'))
     return date(year=year, month=month, day=day)
 
 
-async def fetch_single_route(
-    start_coords: Tuple[float, float],
-    end_coords: Tuple[float, float],
-) -> List[Tuple[float]]:
-    start_longitude, start_latitude = start_coords
-    end_longitude, end_latitude = end_coords
-    url = f'https://router.project-osrm.org/route/v1/driving/{start_longitude},{start_latitude};{end_longitude},{end_latitude}?steps=true'
-    response = requests.get(url, headers=user_agent_headers)
-    data = response.json()
-
-    if data['code'] != 'Ok':
-        return [start_coords, end_coords]
-    
-    mid_coords = []
-    for step in data['routes'][0]['legs'][0]['steps']:
-        coords = tuple(step['maneuver']['location'])
-        mid_coords.append(coords)
-    
-    return [start_coords] + mid_coords + [end_coords]
+def journey_map_coords(user: User, locations: List[Location]) -> List[Tuple[float, float]]:
+    return [(user.lon, user.lat)] + [(location.lon, location.lat) for location in locations]
 
 
-async def fetch_route(coords: List[Tuple[float]]) -> List[Tuple[float]]:
-    points = []
-    point_A = coords[0]
-    for point_B in coords:
-        newpts = await fetch_single_route(start_coords=point_A, end_coords=point_B)
-        points += newpts
-        point_A = point_B
-    return points
+async def render_journey_map(coords: List[Tuple[float, float]]) -> bytes | None:
+    legs = await fetch_route(coords=coords)
+    return await render_map(coords=coords, legs=legs)
 
 
-async def save_map_to_png(
-    user: User,
+async def fetch_restaurants_near_locations(
     locations: List[Location],
-) -> None:
-    coords = [(user.lon, user.lat)] + [(location.lon, location.lat) for location in locations]
-
-    m = StaticMap(1000, 1000, 10)
-    for lon, lat in coords:
-        m.add_marker(CircleMarker((lon, lat), 'blue', 12))
-
-    route = await fetch_route(coords=coords)
-
-    point_A = route[0]
-    for coord in route:
-        point_B = coord
-        m.add_line(Line([point_A, point_B], 'black', 3))
-        point_A = point_B
-    
-    image = m.render()
-    image.save(f'{ROOT}/bot/temp_files/map.png')
-
-
-async def delete_map() -> None:
-    os.remove(path=f'{ROOT}/bot/temp_files/map.png')
-
-
-async def fetch_restaurants_near_location(
-    location: Location,
     radius_meters: int = 5_000,
     language: str = 'en',
-) -> List[str] | None:
-    overpass_url = 'http://overpass-api.de/api/interpreter'
-
-    latitude, longitude = location.lat, location.lon
-
-    overpass_query = f'''
-        [out:json][timeout:25];
-        (
-            node["amenity"="restaurant"](around:{radius_meters},{latitude},{longitude});
-            way["amenity"="restaurant"](around:{radius_meters},{latitude},{longitude});
-            relation["amenity"="restaurant"](around:{radius_meters},{latitude},{longitude});
-        );
-        out tags;
-    '''
-    response = requests.post(overpass_url, data=overpass_query, headers=user_agent_headers)
-    if response.status_code == 200:
-        json = response.json()
+) -> List[List[str] | None]:
+    points = [(location.lat, location.lon) for location in locations]
+    elements_per_location = await fetch_pois_near_points('restaurants', points, radius_meters)
+
+    restaurants_per_location = []
+    for elements in elements_per_location:
+        if elements is None:
+            restaurants_per_location.append(None)
+            continue
         restaurants = []
-        for restaurant in json['elements']:
+        for restaurant in elements:
             if 'tags' in restaurant and 'name' in restaurant['tags']:
                 name = restaurant['tags'].get(f'name:{language}', restaurant['tags']['name'])
                 restaurants.append(name)
-        return sorted(restaurants)[:5]
-    else:
-        return None
-
-
-async def fetch_sights_near_location(
-    location: Location,
-    radius_meters: int = 15_000
-) -> List[str] | None:
-    overpass_url = 'http://overpass-api.de/api/interpreter'
-
-    latitude, longitude = location.lat, location.lon
-
-    overpass_query = f'''
-        [out:json];
-        node["tourism"="attraction"](around:{radius_meters},{latitude},{longitude});
-        way["tourism"="attraction"](around:{radius_meters},{latitude},{longitude});
-        relation["tourism"="attraction"](around:{radius_meters},{latitude},{longitude});
-        out;
-    '''
-    response = requests.post(overpass_url, data=overpass_query, headers=user_agent_headers)
-    if response.status_code == 200:
+        restaurants_per_location.append(sorted(restaurants)[:5])
+    return restaurants_per_location
+
+
+async def fetch_sights_near_locations(
+    locations: List[Location],
+    radius_meters: int = 15_000,
+) -> List[List[str] | None]:
+    points = [(location.lat, location.lon) for location in locations]
+    elements_per_location = await fetch_pois_near_points('sights', points, radius_meters)
+
+    sights_per_location = []
+    for elements in elements_per_location:
+        if elements is None:
+            sights_per_location.append(None)
+            continue
         sights = []
-        json = response.json()
-        for place in json['elements']:
+        for place in elements:
             if 'tags' in place and 'name' in place['tags']:
                 sights.append(place['tags']['name'])
-        if len(sights) == 0:
-            return None
-        return sorted(sights)[:5]
-    else:
-        return None
+        sights_per_location.append(sorted(sights)[:5] if len(sights) > 0 else None)
+    return sights_per_location
 
 
-async def fetch_hotels_near_location(
-    location: Location,
+async def fetch_hotels_near_locations(
+    locations: List[Location],
     radius_meters: int = 1000,
-) -> List[str] | None:
-    overpass_url = 'http://overpass-api.de/api/interpreter'
-    
-    latitude = location.lat
-    longitude = location.lon
-
-    overpass_query = f'''
-        [out:json];
-        node["tourism"="hotel"](around:{radius_meters},{latitude},{longitude});
-        out;
-    '''
-    response = requests.post(overpass_url, data=overpass_query, headers=user_agent_headers)
-    if response.status_code == 200:
-        pprint(response.json(), stream=open('debug.txt', mode='w'))
+) -> List[List[str] | None]:
+    points = [(location.lat, location.lon) for location in locations]
+    elements_per_location = await fetch_pois_near_points('hotels', points, radius_meters)
+
+    hotels_per_location = []
+    for elements in elements_per_location:
+        if elements is None:
+            hotels_per_location.append(None)
+            continue
         hotel_names = []
-        for hotel in response.json()['elements']:
+        for hotel in elements:
             if 'tags' in hotel and 'name' in hotel['tags']:
                 hotel_names.append(hotel['tags']['name'])
-        if len(hotel_names) == 0:
-            return None
-        return sorted(hotel_names)[:5]
-    else:
-        return None
-
-
-async def fetch_weather_data(location: Location) -> List[Dict[str, float]]:
-    start_date = location.date_start
-    end_date = location.date_end
-    lat = location.lat
-    lon = location.lon
-
-    url = 'https://api.open-meteo.com/v1/forecast'
-    params = {
-        'latitude': lat,
-        'longitude': lon,
-        'hourly': 'temperature_2m',
-        'start_date': str(start_date),
-        'end_date': str(end_date),
-    }
-    try:
-        responses = openmeteo.weather_api(url, params=params)
-
-        response = responses[0]
-
-        hourly = response.Hourly()
-        hourly_temperature_2m = hourly.Variables(0).ValuesAsNumpy()
-
-        hourly_data = {'date': pd.date_range(
-            start = pd.to_datetime(hourly.Time(), unit = 's', utc = True),
-            end = pd.to_datetime(hourly.TimeEnd(), unit = 's', utc = True),
-            freq = pd.Timedelta(seconds = hourly.Interval()),
-            inclusive = 'left',
-        )}
-        hourly_data['temperature_2m'] = hourly_temperature_2m
-
-        hourly_dataframe = pd.DataFrame(data = hourly_data)
-        hourly_dataframe['date'] = hourly_dataframe['date'].apply(lambda x: str(x).split()[0])
-        grouped = hourly_dataframe.groupby('date').mean().reset_index()
-
-        weathers = []
-        for i in range(len(grouped)):
-            weathers.append({
-                'date': grouped.iloc[i, 0],
-                'temperature_2m': f'{round(float(grouped.iloc[i, 1]), 1)} ºC',
-            })
-        return weathers
-    except Exception:
-        return None
+        hotels_per_location.append(sorted(hotel_names)[:5] if len(hotel_names) > 0 else None)
+    return hotels_per_location
 
 
 journey_router = Router()
@@ -286,14 +157,12 @@ class JourneyRemoveForm(StatesGroup):
 
 ''' Create New Journey Func Group '''
 @journey_router.message(Command(commands=['create_journey']))
-async def start_create_journey(message: Message, state: FSMContext) -> None:
-    user = await get_user_by_telegram_userid(db_session=session, telegram_id=message.from_user.id)
+async def start_create_journey(message: Message, state: FSMContext, user: User | None) -> None:
     if user is None:
         await state.clear()
         await message.answer('🤓 You are not signed up!. Use /start', reply_markup=DEFAULT_KEYBOARD)
     else:
         await state.set_state(JourneyCreateForm.title)
-        await state.update_data(user=user)
         await message.answer(
             '✍️ Provide some information about your trip. What would you call it?',
             reply_markup=DEFAULT_KEYBOARD,
@@ -301,13 +170,10 @@ async def start_create_journey(message: Message, state: FSMContext) -> None:
 
 
 @journey_router.message(JourneyCreateForm.title)
-async def set_title_journey(message: Message, state: FSMContext) -> None:
+async def set_title_journey(message: Message, state: FSMContext, db_session: AsyncSession, user: User | None) -> None:
     title = message.text
 
-    data = await state.get_data()
-    user = data['user']
-
-    journeys = await get_all_user_journeys(db_session=session, owner_id=user.id)
+    journeys = await get_all_user_journeys(db_session=db_session, owner_id=user.id, collections=())
     
     if len(title) > 50:
         await message.answer(
@@ -329,7 +195,7 @@ async def set_title_journey(message: Message, state: FSMContext) -> None:
 
 
 @journey_router.message(JourneyCreateForm.description)
-async def set_description_journey(message: Message, state: FSMContext) -> None:
+async def set_description_journey(message: Message, state: FSMContext, db_session: AsyncSession, user: User | None) -> None:
     description = message.text
     if len(description) > 100:
         await message.answer(
@@ -338,9 +204,8 @@ async def set_description_journey(message: Message, state: FSMContext) -> None:
         )
     else:
         data = await state.update_data(description=description)
-        user = await get_user_by_telegram_userid(db_session=session, telegram_id=message.from_user.id)
         await create_journey(
-            db_session=session,
+            db_session=db_session,
             owner_id=user.id,
             title=data['title'],
             description=data['description'],
@@ -358,9 +223,8 @@ async def end_create_journey(message: Message, state: FSMContext) -> None:
 
 ''' Get All User Journeys '''
 @journey_router.message(Command(commands=['journey_list']))
-async def get_journeys(message: Message) -> None:
-    user = await get_user_by_telegram_userid(db_session=session, telegram_id=message.from_user.id)
-    journeys = await get_all_user_journeys(db_session=session, owner_id=user.id)
+async def get_journeys(message: Message, db_session: AsyncSession, user: User | None) -> None:
+    journeys = await get_all_user_journeys(db_session=db_session, owner_id=user.id, collections=('locations',))
     text = ''
     if len(journeys) == 0:
         await message.answer(
@@ -384,9 +248,8 @@ async def get_journeys(message: Message) -> None:
 
 ''' Get a Particular Journey Info Func Group '''
 @journey_router.message(Command(commands=['journey_info']))
-async def start_get_journey(message: Message, state: FSMContext) -> None:
-    user = await get_user_by_telegram_userid(db_session=session, telegram_id=message.from_user.id)
-    journeys = await get_all_user_journeys(db_session=session, owner_id=user.id)
+async def start_get_journey(message: Message, state: FSMContext, db_session: AsyncSession, user: User | None) -> None:
+    journeys = await get_all_user_journeys(db_session=db_session, owner_id=user.id, collections=())
 
     if len(journeys) > 0:
         keyboard = journey_list_keyboard(journey_list=journeys)
@@ -401,10 +264,12 @@ async def start_get_journey(message: Message, state: FSMContext) -> None:
 
 
 @journey_router.message(JourneyInfoForm.to_title)
-async def get_journey_info(message: Message, state: FSMContext) -> None:
-    user = await get_user_by_telegram_userid(db_session=session, telegram_id=message.from_user.id)
-    journey = await get_journey_by_title(db_session=session, journey_title=message.text, owner_id=user.id)
-    journeys = await get_all_user_journeys(db_session=session, owner_id=user.id)
+async def get_journey_info(message: Message, state: FSMContext, db_session: AsyncSession, user: User | None) -> None:
+    journey = await get_journey_by_title(
+        db_session=db_session, journey_title=message.text, owner_id=user.id,
+        collections=('locations',), strategy='joined',
+    )
+    journeys = await get_all_user_journeys(db_session=db_session, owner_id=user.id, collections=())
 
     if journey is None or journey not in journeys:
         keyboard = journey_list_keyboard(journey_list=journeys)
@@ -413,7 +278,7 @@ async def get_journey_info(message: Message, state: FSMContext) -> None:
         )
     elif len(journey.locations) > 0:
         await state.set_state(JourneyInfoForm.to_info)
-        await state.update_data(journey=journey, user=user)
+        await state.update_data(journey_id=journey.id)
         await message.answer(
             '🧐 What exactly do you want to know?',
             reply_markup=JOURNEY_INFO_KEYBOARD,
@@ -427,12 +292,20 @@ async def get_journey_info(message: Message, state: FSMContext) -> None:
 
 
 @journey_router.message(JourneyInfoForm.to_info)
-async def display_journey_info(message: Message, state: FSMContext) -> None:
+async def display_journey_info(message: Message, state: FSMContext, db_session: AsyncSession, user: User | None) -> None:
     info_request = message.text
+    data = await state.get_data()
+    journey = await get_journey_by_id(
+        db_session=db_session, journey_id=data['journey_id'],
+        collections=('locations',), strategy='joined',
+    )
+
+    if journey is None:
+        await state.clear()
+        await message.answer(JOURNEY_NO_LONGER_EXISTS, reply_markup=DEFAULT_KEYBOARD)
+        return
+
     if info_request == 'Location List':
-        data = await state.get_data()
-        journey = data['journey']
-        
         lines = [f'ℹ️ Journey {journey.title}\n{journey.description}\n---']
         
         locations: List[Location] = list(journey.locations)
@@ -448,42 +321,41 @@ async def display_journey_info(message: Message, state: FSMContext) -> None:
         await message.answer('\n'.join(lines), reply_markup=DEFAULT_KEYBOARD)
         await state.clear()
     elif info_request == 'Weather':
-        data = await state.get_data()
-        journey = data['journey']
 
         lines = [f'ℹ️ Journey {journey.title}\n{journey.description}\n---']
         
         locations = journey.locations
         locations.sort(key=lambda location: location.date_start)
 
-        for location in locations:
-            lines.append(hitalic(location.place))
-            weathers = await fetch_weather_data(location=location)
+        weathers_list = await fetch_journey_weather(locations=locations)
 
+        for location, weathers in zip(locations, weathers_list):
+            lines.append(hitalic(location.place))
             if weathers is None:
                 lines.append('Something went wrong. Come back later\n')
             else:
-                lines.append('Average daily temperatures:')
+                lines.append('Average daily temperatures (min..max), precipitation, max wind:')
                 for weather in weathers:
-                    lines.append(f'{weather["date"]} : {weather["temperature_2m"]}')
+                    lines.append(
+                        f'{weather["date"]} : {weather["temperature_2m"]} '
+                        f'({weather["temperature_2m_range"]}), '
+                        f'{weather["precipitation"]}, {weather["wind_speed_10m"]}'
+                    )
             lines.append('\n')
         
         await message.answer('\n'.join(lines), reply_markup=DEFAULT_KEYBOARD)
         await state.clear()
     elif info_request == 'Sightseeing':
-        data = await state.get_data()
-        journey = data['journey']
 
         lines = [f'ℹ️ Journey {journey.title}\n{journey.description}\n---']
 
         locations = journey.locations
         locations.sort(key=lambda location: location.date_start)
 
-        for location in locations:
+        sights_list = await fetch_sights_near_locations(locations=locations)
+
+        for location, sights in zip(locations, sights_list):
             lines.append(hitalic(location.place))
-            sights = await fetch_sights_near_location(
-                location=location,
-            )
             if sights is None:
                 lines.append('No sightseeing places found nearby')
             else:
@@ -495,20 +367,19 @@ async def display_journey_info(message: Message, state: FSMContext) -> None:
         await message.answer('\n'.join(lines), reply_markup=DEFAULT_KEYBOARD)
         await state.clear()
     elif info_request == 'Hotels':
-        data = await state.get_data()
-        journey = data['journey']
 
         lines = [f'ℹ️ Journey {journey.title}\n{journey.description}\n---']
 
         locations = journey.locations
         locations.sort(key=lambda location: location.date_start)
 
-        for location in locations:
+        hotel_names_list = await fetch_hotels_near_locations(
+            locations=locations,
+            radius_meters=7_000,
+        )
+
+        for location, hotel_names in zip(locations, hotel_names_list):
             lines.append(hitalic(location.place))
-            hotel_names = await fetch_hotels_near_location(
-                location=location,
-                radius_meters=7_000,
-            )
             if hotel_names is None:
                 lines.append('No hotels found nearby')
             else:
@@ -520,19 +391,16 @@ async def display_journey_info(message: Message, state: FSMContext) -> None:
         await message.answer('\n'.join(lines), reply_markup=DEFAULT_KEYBOARD)
         await state.clear()
     elif info_request == 'Restaurants':
-        data = await state.get_data()
-        journey = data['journey']
 
         lines = [f'ℹ️ Journey {journey.title}\n{journey.description}\n---']
 
         locations = journey.locations
         locations.sort(key=lambda location: location.date_start)
         
-        for location in locations:
+        restaurants_list = await fetch_restaurants_near_locations(locations=locations)
+
+        for location, restaurants in zip(locations, restaurants_list):
             lines.append(hitalic(location.place))
-            restaurants = await fetch_restaurants_near_location(
-                location=location,
-            )
             if restaurants is None:
                 lines.append('No restaurants found nearby')
             else:
@@ -543,18 +411,31 @@ async def display_journey_info(message: Message, state: FSMContext) -> None:
         await message.answer('\n'.join(lines), reply_markup=DEFAULT_KEYBOARD)
         await state.clear()
     elif info_request == 'Map Route':
-        data = await state.get_data()
-        journey = data['journey']
-        user = data['user']
-
         locations = list(journey.locations)
         locations.sort(key=lambda location: location.date_start)
 
+        coords = journey_map_coords(user=user, locations=locations)
+        file_id = get_map_file_id(coords=coords)
+        if file_id is not None:
+            try:
+                await message.answer_photo(file_id)
+                await state.clear()
+                return
+            except TelegramBadRequest:
+                invalidate_journey_map(journey_id=journey.id)
+
         await message.answer('Loading... Please, wait a second')
-        await save_map_to_png(locations=journey.locations, user=user)
-        photo = FSInputFile(f'{ROOT}/bot/temp_files/map.png')
-        await message.answer_photo(photo)
-        await delete_map()
+        png = await render_journey_map(coords=coords)
+        if png is not None:
+            sent = await message.answer_photo(BufferedInputFile(png, filename='map.png'))
+            remember_map_file_id(
+                journey_id=journey.id, coords=coords, file_id=sent.photo[-1].file_id
+            )
+        else:
+            await message.answer(
+                '🫨 Could not draw the map right now. Come back later',
+                reply_markup=DEFAULT_KEYBOARD,
+            )
         await state.clear()
     else:
         await message.answer('🤓 Use the buttons, please', reply_markup=JOURNEY_INFO_KEYBOARD)
@@ -562,9 +443,8 @@ async def display_journey_info(message: Message, state: FSMContext) -> None:
 
 ''' Start Adding Locations Func Group '''
 @journey_router.message(Command(commands=['add_location']))
-async def start_add_location(message: Message, state: FSMContext) -> None:
-    user = await get_user_by_telegram_userid(db_session=session, telegram_id=message.from_user.id)
-    journeys = await get_all_user_journeys(db_session=session, owner_id=user.id)
+async def start_add_location(message: Message, state: FSMContext, db_session: AsyncSession, user: User | None) -> None:
+    journeys = await get_all_user_journeys(db_session=db_session, owner_id=user.id, collections=())
 
     if len(journeys) > 0:
         keyboard = journey_list_keyboard(journey_list=journeys)
@@ -583,17 +463,17 @@ async def start_add_location(message: Message, state: FSMContext) -> None:
 
 
 @journey_router.message(LocationCreateForm.journey)
-async def set_journey_location(message: Message, state: FSMContext) -> None:
+async def set_journey_location(message: Message, state: FSMContext, db_session: AsyncSession, user: User | None) -> None:
     journey_title = message.text
-    user = await get_user_by_telegram_userid(db_session=session, telegram_id=message.from_user.id)
-    journeys = await get_all_user_journeys(db_session=session, owner_id=user.id)
+    journeys = await get_all_user_journeys(db_session=db_session, owner_id=user.id, collections=())
+    journey_ids = {journey.title: journey.id for journey in journeys}
 
-    if journey_title not in [journey.title for journey in journeys]:
+    if journey_title not in journey_ids:
         keyboard = journey_list_keyboard(journey_list=journeys)
         await message.answer('🤓 Invalid journey. Use the buttons', reply_markup=keyboard)
     else:
         await state.set_state(LocationCreateForm.location)
-        await state.update_data(journey=journey_title)
+        await state.update_data(journey_id=journey_ids[journey_title])
         await message.answer(
             f'🧐 A new location to visit! Where is it?',
             reply_markup=DEFAULT_KEYBOARD,
@@ -629,7 +509,7 @@ async def set_date_start_location(message: Message, state: FSMContext) -> None:
         day, month, year = map(int, datestr.split('-'))
         dt = date(year=year, month=month, day=day)
         await state.set_state(LocationCreateForm.date_end)
-        await state.update_data(date_start=dt)
+        await state.update_data(date_start=dt.isoformat())
         await message.answer(
             'Good! When do you plan to leave the place? DD-MM-YYYY format 😉', reply_markup=DEFAULT_KEYBOARD
         )
@@ -641,9 +521,8 @@ async def set_date_start_location(message: Message, state: FSMContext) -> None:
 
 
 @journey_router.message(LocationCreateForm.date_end)
-async def set_date_end_location(message: Message, state: FSMContext) -> None:
+async def set_date_end_location(message: Message, state: FSMContext, db_session: AsyncSession) -> None:
     datestr = message.text
-    user = await get_user_by_telegram_userid(db_session=session, telegram_id=message.from_user.id)
 
     try:
         if not await validate_date(datestr):
@@ -651,22 +530,29 @@ async def set_date_end_location(message: Message, state: FSMContext) -> None:
 
         day, month, year = map(int, datestr.split('-'))
         dt = date(year=year, month=month, day=day)
-        data = await state.update_data(date_end=dt)
-        date_start = data['date_start']
+        data = await state.get_data()
+        date_start = date.fromisoformat(data['date_start'])
 
         if date_start > dt:
             raise ValueError(DATE_CONFLICTS_WITH_ANOTHER_DATE)
 
+        journey = await get_journey_by_id(
+            db_session=db_session, journey_id=data['journey_id'],
+            collections=('locations',), strategy='joined',
+        )
+        if journey is None:
+            await state.clear()
+            await message.answer(JOURNEY_NO_LONGER_EXISTS, reply_markup=DEFAULT_KEYBOARD)
+            return
+
         await create_location(
-            db_session=session,
+            db_session=db_session,
             place=data['place'],
-            date_start=data['date_start'],
-            date_end=data['date_end'],
+            date_start=date_start,
+            date_end=dt,
             lat=data['lat'],
             lon=data['lon'],
-            journey=await get_journey_by_title(
-                db_session=session, journey_title=data['journey'], owner_id=user.id
-            ),
+            journey=journey,
         )
         await finish_add_location(message=message, state=state)
     except ValueError as e:
@@ -688,9 +574,8 @@ async def finish_add_location(message: Message, state: FSMContext) -> None:
 
 ''' Remove Locations Func Group '''
 @journey_router.message(Command(commands=['remove_location']))
-async def start_remove_location(message: Message, state: FSMContext) -> None:
-    user = await get_user_by_telegram_userid(db_session=session, telegram_id=message.from_user.id)
-    journeys = await get_all_user_journeys(db_session=session, owner_id=user.id)
+async def start_remove_location(message: Message, state: FSMContext, db_session: AsyncSession, user: User | None) -> None:
+    journeys = await get_all_user_journeys(db_session=db_session, owner_id=user.id, collections=())
 
     if len(journeys) > 0:
         keyboard = journey_list_keyboard(journey_list=journeys)
@@ -709,11 +594,13 @@ async def start_remove_location(message: Message, state: FSMContext) -> None:
 
 
 @journey_router.message(LocationRemoveForm.to_journey)
-async def select_remove_location(message: Message, state: FSMContext) -> None:
-    user = await get_user_by_telegram_userid(db_session=session, telegram_id=message.from_user.id)
-    journey = await get_journey_by_title(db_session=session, journey_title=message.text, owner_id=user.id)
+async def select_remove_location(message: Message, state: FSMContext, db_session: AsyncSession, user: User | None) -> None:
+    journey = await get_journey_by_title(
+        db_session=db_session, journey_title=message.text, owner_id=user.id,
+        collections=('locations',), strategy='joined',
+    )
 
-    journeys = await get_all_user_journeys(db_session=session, owner_id=user.id)
+    journeys = await get_all_user_journeys(db_session=db_session, owner_id=user.id, collections=())
 
     if journey is None or journey not in journeys:
         keyboard = journey_list_keyboard(journey_list=journeys)
@@ -721,7 +608,7 @@ async def select_remove_location(message: Message, state: FSMContext) -> None:
             '⚠️ You do not have such journey. Use the buttons', reply_markup=keyboard
         )
     elif len(journey.locations) > 0:
-        await state.update_data(journey=journey)
+        await state.update_data(journey_id=journey.id)
         await state.set_state(LocationRemoveForm.to_remove)
         keyboard = journey_location_list_keyboard(journey=journey)
 
@@ -738,15 +625,22 @@ async def select_remove_location(message: Message, state: FSMContext) -> None:
 
 
 @journey_router.message(LocationRemoveForm.to_remove)
-async def remove_location(message: Message, state: FSMContext) -> None:
+async def remove_location(message: Message, state: FSMContext, db_session: AsyncSession) -> None:
     data = await state.get_data()
-    journey = data['journey']
+    journey = await get_journey_by_id(
+        db_session=db_session, journey_id=data['journey_id'],
+        collections=('locations',), strategy='joined',
+    )
+    if journey is None:
+        await state.clear()
+        await message.answer(JOURNEY_NO_LONGER_EXISTS, reply_markup=DEFAULT_KEYBOARD)
+        return
 
     msg = message.text.replace(' - ', ':')
 
     place, date_start, date_end = [it.strip() for it in msg.split(':')]
     location = await get_location_by_journey_place_datestart_dateend(
-        db_session=session,
+        db_session=db_session,
         place=place,
         journey=journey,
         date_start=datestr_to_date(date_start),
@@ -762,7 +656,7 @@ async def remove_location(message: Message, state: FSMContext) -> None:
     else:
         await state.clear()
         await delete_location_from_journey(
-            db_session=session, journey=journey, location=location
+            db_session=db_session, journey=journey, location=location
         )
         await message.answer(
             '✅ Location removed successfully',
@@ -772,10 +666,9 @@ async def remove_location(message: Message, state: FSMContext) -> None:
 
 ''' Edit Journey [Title & Description & Locations] Func Group '''
 @journey_router.message(Command(commands=['edit_journey']))
-async def start_edit_journey(message: Message, state: FSMContext) -> None:
+async def start_edit_journey(message: Message, state: FSMContext, db_session: AsyncSession, user: User | None) -> None:
 
-    user = await get_user_by_telegram_userid(db_session=session, telegram_id=message.from_user.id)
-    journeys = await get_all_user_journeys(db_session=session, owner_id=user.id)
+    journeys = await get_all_user_journeys(db_session=db_session, owner_id=user.id, collections=())
 
     keyboard = journey_list_keyboard(journey_list=journeys)
     await state.set_state(JourneyEditForm.to_choose_parameter_edit)
@@ -786,11 +679,13 @@ async def start_edit_journey(message: Message, state: FSMContext) -> None:
 
 
 @journey_router.message(JourneyEditForm.to_choose_parameter_edit)
-async def select_edit_journey(message: Message, state: FSMContext) -> None:
-    user = await get_user_by_telegram_userid(db_session=session, telegram_id=message.from_user.id)
-    journey = await get_journey_by_title(db_session=session, journey_title=message.text, owner_id=user.id)
+async def select_edit_journey(message: Message, state: FSMContext, db_session: AsyncSession, user: User | None) -> None:
+    journey = await get_journey_by_title(
+        db_session=db_session, journey_title=message.text, owner_id=user.id,
+        collections=('locations',), strategy='joined',
+    )
 
-    journeys = await get_all_user_journeys(db_session=session, owner_id=user.id)
+    journeys = await get_all_user_journeys(db_session=db_session, owner_id=user.id, collections=())
 
     if journey not in journeys:
         keyboard = journey_list_keyboard(journey_list=journeys)
@@ -800,7 +695,7 @@ async def select_edit_journey(message: Message, state: FSMContext) -> None:
         )
     else:
         await state.set_state(JourneyEditForm.to_start_edit)
-        await state.update_data(journey=journey, journeys=journeys)
+        await state.update_data(journey_id=journey.id)
         await message.answer(
             '🧐 What do you want to change?',
             reply_markup=EDIT_JOURNEY_PARAMS_KEYBOARD,
@@ -808,7 +703,7 @@ async def select_edit_journey(message: Message, state: FSMContext) -> None:
 
 
 @journey_router.message(JourneyEditForm.to_start_edit)
-async def select_parameter_edit_journey(message: Message, state: FSMContext) -> None:
+async def select_parameter_edit_journey(message: Message, state: FSMContext, db_session: AsyncSession) -> None:
     if message.text not in ['Title', 'Description', 'Locations']:
         await message.answer(
             '⚠️ Invalid parameter. Use the buttons',
@@ -830,7 +725,15 @@ async def select_parameter_edit_journey(message: Message, state: FSMContext) ->
     elif message.text == 'Locations':
         await state.set_state(JourneyEditForm.to_edit)
         data = await state.update_data(edit='locations')
-        journey = data['journey']
+        journey = await get_journey_by_id(
+            db_session=db_session, journey_id=data['journey_id'],
+            collections=('locations',), strategy='joined',
+        )
+        if journey is None:
+            await state.clear()
+            await message.answer(JOURNEY_NO_LONGER_EXISTS, reply_markup=DEFAULT_KEYBOARD)
+            return
+
         keyboard = journey_location_list_keyboard(journey=journey)
         if len(journey.locations) == 0:
             await state.clear()
@@ -846,25 +749,30 @@ async def select_parameter_edit_journey(message: Message, state: FSMContext) ->
 
 
 @journey_router.message(JourneyEditForm.to_edit)
-async def input_edit_journey(message: Message, state: FSMContext) -> None:
+async def input_edit_journey(message: Message, state: FSMContext, db_session: AsyncSession, user: User | None) -> None:
     data = await state.get_data()
+    journey = await get_journey_by_id(db_session=db_session, journey_id=data['journey_id'], collections=())
+    if journey is None:
+        await state.clear()
+        await message.answer(JOURNEY_NO_LONGER_EXISTS, reply_markup=DEFAULT_KEYBOARD)
+        return
+
     if data['edit'] == 'title':
         title = message.text
-        journeys = data['journeys']
+        journeys = await get_all_user_journeys(db_session=db_session, owner_id=user.id, collections=())
         if len(title) > 50:
             await message.answer(
                 '⚠️ New title is too long. Think of something shorter',
                 reply_markup=DEFAULT_KEYBOARD,
             )
-        elif title in [journey.title for journey in journeys] and title != data['journey'].title:
+        elif title in [other.title for other in journeys] and title != journey.title:
             await message.answer(
                 '⚠️ You already have such a journey. Please try another one',
                 reply_markup=DEFAULT_KEYBOARD,
             )
         else:
-            journey = data['journey']
             await update_journey(
-                db_session=session,
+                db_session=db_session,
                 journey=journey,
                 new_title=title,
             )
@@ -877,9 +785,8 @@ async def input_edit_journey(message: Message, state: FSMContext) -> None:
                 reply_markup=DEFAULT_KEYBOARD,
             )
         else:
-            journey = data['journey']
             await update_journey(
-                db_session=session, journey=journey, new_description=description
+                db_session=db_session, journey=journey, new_description=description
             )
             await finish_edit_journey(message=message, state=state)
     elif data['edit'] == 'locations':
@@ -930,12 +837,18 @@ async def edit_location_choose_parameter_journey(
 
 
 @journey_router.message(JourneyEditForm.to_input_edit_info_location)
-async def edit_location_parameter_journey(message: Message, state: FSMContext) -> None:
+async def edit_location_parameter_journey(message: Message, state: FSMContext, db_session: AsyncSession) -> None:
     data = await state.get_data()
+    journey = await get_journey_by_id(db_session=db_session, journey_id=data['journey_id'], collections=())
+    if journey is None:
+        await state.clear()
+        await message.answer(JOURNEY_NO_LONGER_EXISTS, reply_markup=DEFAULT_KEYBOARD)
+        return
+
     location = await get_location_by_journey_place_datestart_dateend(
-        db_session=session,
+        db_session=db_session,
         place=data['locplace'],
-        journey=data['journey'],
+        journey=journey,
         date_start=datestr_to_date(data['datestart_str']),
         date_end=datestr_to_date(data['dateend_str']),
     )
@@ -944,7 +857,7 @@ async def edit_location_parameter_journey(message: Message, state: FSMContext) -
         is_valid, _, placename, lat, lon = await validate_location(city=place)
         if is_valid:
             await update_location(
-                db_session=session,
+                db_session=db_session,
                 location=location,
                 new_place=placename,
                 new_lat=lat,
@@ -968,7 +881,7 @@ async def edit_location_parameter_journey(message: Message, state: FSMContext) -
                 raise ValueError(DATE_CONFLICTS_WITH_ANOTHER_DATE)
 
             await update_location(
-                db_session=session,
+                db_session=db_session,
                 location=location,
                 new_date_start=dt,
             )
@@ -996,7 +909,7 @@ async def edit_location_parameter_journey(message: Message, state: FSMContext) -
                 raise ValueError(DATE_CONFLICTS_WITH_ANOTHER_DATE)
 
             await update_location(
-                db_session=session,
+                db_session=db_session,
                 location=location,
                 new_date_end=dt,
             )
@@ -1018,14 +931,12 @@ async def finish_edit_journey(message: Message, state: FSMContext) -> None:
 
 ''' Journey Remove Func Group '''
 @journey_router.message(Command(commands=['remove_journey']))
-async def start_remove_journey(message: Message, state: FSMContext) -> None:
-    user = await get_user_by_telegram_userid(db_session=session, telegram_id=message.from_user.id)
-    journeys = await get_all_user_journeys(db_session=session, owner_id=user.id)
+async def start_remove_journey(message: Message, state: FSMContext, db_session: AsyncSession, user: User | None) -> None:
+    journeys = await get_all_user_journeys(db_session=db_session, owner_id=user.id, collections=())
 
     if len(journeys) > 0:
         keyboard = journey_list_keyboard(journey_list=journeys)
         await state.set_state(JourneyRemoveForm.to_remove)
-        await state.update_data(journeys=journeys)
         await message.answer('🧐 What is your journey called?', reply_markup=keyboard)
     else:
         await state.clear()
@@ -1036,21 +947,19 @@ async def start_remove_journey(message: Message, state: FSMContext) -> None:
 
 
 @journey_router.message(JourneyRemoveForm.to_remove)
-async def remove_journey(message: Message, state: FSMContext) -> None:
+async def remove_journey(message: Message, state: FSMContext, db_session: AsyncSession, user: User | None) -> None:
     title = message.text
-    user = await get_user_by_telegram_userid(db_session=session, telegram_id=message.from_user.id)
-    journey = await get_journey_by_title(db_session=session, journey_title=title, owner_id=user.id)
-    data = await state.get_data()
-    journeys = data['journeys']
+    journey = await get_journey_by_title(db_session=db_session, journey_title=title, owner_id=user.id)
+    journeys = await get_all_user_journeys(db_session=db_session, owner_id=user.id, collections=())
 
-    if journey is None or journey not in journeys:
+    if journey is None or journey.id not in [journey.id for journey in journeys]:
         keyboard = journey_list_keyboard(journey_list=journeys)
         await message.answer(
             '⚠️ You do not have such journey. Use the buttons',
             reply_markup=keyboard,
         )
     else:
-        await delete_journey(db_session=session, journey=journey)
+        await delete_journey(db_session=db_session, journey=journey)
         await finish_remove_journey(message=message, state=state)
 
 
@@ -3,16 +3,19 @@ from aiogram.filters import Command
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 from aiogram.types import Message
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from data.crud import (
     get_all_user_journeys,
+    get_journey_by_id,
     get_journey_by_title,
-    get_user_by_telegram_userid,
     create_note,
     delete_note,
+    get_note_by_id,
     get_note_by_title,
     update_note,
 )
+from data.models import User
 from ux.keyboards import (
     DEFAULT_KEYBOARD,
     EDIT_NOTE_PARAMS_KEYBOARD,
@@ -20,9 +23,10 @@ from ux.keyboards import (
     journey_note_list_keyboard,
 )
 from ux.typical_answers import (
+    JOURNEY_NO_LONGER_EXISTS,
+    NOTE_NO_LONGER_EXISTS,
     generate_note_text,
 )
-from settings import session
 
 notes_router = Router()
 
@@ -51,17 +55,14 @@ class NoteRemoveForm(StatesGroup):
 
 ''' Create Note Func Group '''
 @notes_router.message(Command(commands=['add_note']))
-async def start_create_note(message: Message, state: FSMContext) -> None:
+async def start_create_note(message: Message, state: FSMContext, db_session: AsyncSession, user: User | None) -> None:
     await state.clear()
 
-    user = await get_user_by_telegram_userid(db_session=session, telegram_id=message.from_user.id)
-    journeys = await get_all_user_journeys(db_session=session, owner_id=user.id)
+    journeys = await get_all_user_journeys(db_session=db_session, owner_id=user.id, collections=())
 
     if len(journeys) > 0:
         keyboard = journey_list_keyboard(journey_list=journeys)
 
-        await state.update_data(journeys=journeys)
-
         await state.set_state(NoteCreateForm.journey)
         await message.answer(
             '🧐 To which journey do you want a new note?',
@@ -76,18 +77,18 @@ async def start_create_note(message: Message, state: FSMContext) -> None:
 
 
 @notes_router.message(NoteCreateForm.journey)
-async def set_journey_note(message: Message, state: FSMContext) -> None:
+async def set_journey_note(message: Message, state: FSMContext, db_session: AsyncSession, user: User | None) -> None:
     journey_title = message.text
 
-    data = await state.get_data()
-    journeys = data['journeys']
+    journeys = await get_all_user_journeys(db_session=db_session, owner_id=user.id, collections=())
+    journey_ids = {journey.title: journey.id for journey in journeys}
 
-    if journey_title not in [journey.title for journey in journeys]:
+    if journey_title not in journey_ids:
         keyboard = journey_list_keyboard(journey_list=journeys)
         await message.answer('⚠️ Invalid journey. Use the buttons', reply_markup=keyboard)
     else:
         await state.set_state(NoteCreateForm.title)
-        await state.update_data(journey=journey_title)
+        await state.update_data(journey_id=journey_ids[journey_title])
         await message.answer(
             f'✍️ A new note! What would you call it?',
             reply_markup=DEFAULT_KEYBOARD,
@@ -95,15 +96,18 @@ async def set_journey_note(message: Message, state: FSMContext) -> None:
 
 
 @notes_router.message(NoteCreateForm.title)
-async def set_title_note(message: Message, state: FSMContext) -> None:
+async def set_title_note(message: Message, state: FSMContext, db_session: AsyncSession) -> None:
     title = message.text
     data = await state.get_data()
-    journey_title = data['journey']
 
-    user = await get_user_by_telegram_userid(db_session=session, telegram_id=message.from_user.id)
-    journey = await get_journey_by_title(
-        db_session=session, owner_id=user.id, journey_title=journey_title
+    journey = await get_journey_by_id(
+        db_session=db_session, journey_id=data['journey_id'],
+        collections=('notes',), strategy='joined',
     )
+    if journey is None:
+        await state.clear()
+        await message.answer(JOURNEY_NO_LONGER_EXISTS, reply_markup=DEFAULT_KEYBOARD)
+        return
 
     if title in [note.title for note in journey.notes]:
         await message.answer(
@@ -119,7 +123,7 @@ async def set_title_note(message: Message, state: FSMContext) -> None:
         )
     else:
         await state.set_state(NoteCreateForm.content)
-        await state.update_data(title=title, journey=journey)
+        await state.update_data(title=title)
         await message.answer(
             '✍️ Type in your note itself',
             reply_markup=DEFAULT_KEYBOARD,
@@ -127,7 +131,7 @@ async def set_title_note(message: Message, state: FSMContext) -> None:
 
 
 @notes_router.message(NoteCreateForm.content)
-async def set_content_note(message: Message, state: FSMContext) -> None:
+async def set_content_note(message: Message, state: FSMContext, db_session: AsyncSession) -> None:
     content = message.text
     if len(content) > 500:
         await message.answer(
@@ -136,10 +140,17 @@ async def set_content_note(message: Message, state: FSMContext) -> None:
         )
     else:
         data = await state.update_data(content=content)
-        journey = data['journey']
+        journey = await get_journey_by_id(
+            db_session=db_session, journey_id=data['journey_id'],
+            collections=('notes',), strategy='joined',
+        )
+        if journey is None:
+            await state.clear()
+            await message.answer(JOURNEY_NO_LONGER_EXISTS, reply_markup=DEFAULT_KEYBOARD)
+            return
 
         await create_note(
-            db_session=session,
+            db_session=db_session,
             title=data['title'],
             content=data['content'],
             journey=journey,
@@ -158,17 +169,14 @@ async def finish_create_note(message: Message, state: FSMContext) -> None:
 
 ''' Watch Journey Notes Func Group '''
 @notes_router.message(Command(commands=['see_notes']))
-async def start_watch_journey_notes(message: Message, state: FSMContext) -> None:
+async def start_watch_journey_notes(message: Message, state: FSMContext, db_session: AsyncSession, user: User | None) -> None:
     await state.clear()
 
-    user = await get_user_by_telegram_userid(db_session=session, telegram_id=message.from_user.id)
-    journeys = await get_all_user_journeys(db_session=session, owner_id=user.id)
+    journeys = await get_all_user_journeys(db_session=db_session, owner_id=user.id, collections=())
 
     if len(journeys) > 0:
         keyboard = journey_list_keyboard(journey_list=journeys)
 
-        await state.update_data(journeys=journeys)
-
         await state.set_state(NoteGetForm.note)
         await message.answer(
             '🧐 From which journey do you want to see your notes?',
@@ -183,19 +191,19 @@ async def start_watch_journey_notes(message: Message, state: FSMContext) -> None
 
 
 @notes_router.message(NoteGetForm.note)
-async def display_all_journey_notes(message: Message, state: FSMContext) -> None:
+async def display_all_journey_notes(message: Message, state: FSMContext, db_session: AsyncSession, user: User | None) -> None:
     journey_title = message.text
 
-    data = await state.get_data()
-    if journey_title not in [journey.title for journey in data['journeys']]:
+    journeys = await get_all_user_journeys(db_session=db_session, owner_id=user.id, collections=())
+    if journey_title not in [journey.title for journey in journeys]:
         await message.answer(
             '⚠️ You do not have such journey. Use the buttons',
-            reply_markup=journey_list_keyboard(journey_list=data['journeys']),
+            reply_markup=journey_list_keyboard(journey_list=journeys),
         )
     else:
-        user = await get_user_by_telegram_userid(db_session=session, telegram_id=message.from_user.id)
         journey = await get_journey_by_title(
-            db_session=session, journey_title=journey_title, owner_id=user.id
+            db_session=db_session, journey_title=journey_title, owner_id=user.id,
+            collections=('notes',), strategy='joined',
         )
         notes = journey.notes
         await state.clear()
@@ -218,17 +226,14 @@ async def display_all_journey_notes(message: Message, state: FSMContext) -> None
 
 ''' Edit Note Func Group '''
 @notes_router.message(Command(commands=['edit_note']))
-async def start_edit_journey_note(message: Message, state: FSMContext) -> None:
+async def start_edit_journey_note(message: Message, state: FSMContext, db_session: AsyncSession, user: User | None) -> None:
     await state.clear()
 
-    user = await get_user_by_telegram_userid(db_session=session, telegram_id=message.from_user.id)
-    journeys = await get_all_user_journeys(db_session=session, owner_id=user.id)
+    journeys = await get_all_user_journeys(db_session=db_session, owner_id=user.id, collections=())
 
     if len(journeys) > 0:
         keyboard = journey_list_keyboard(journey_list=journeys)
 
-        await state.update_data(journeys=journeys)
-
         await state.set_state(NoteEditForm.set_journey)
         await message.answer(
             '🧐 From which journey do you want to edit a note?',
@@ -243,11 +248,10 @@ async def start_edit_journey_note(message: Message, state: FSMContext) -> None:
 
 
 @notes_router.message(NoteEditForm.set_journey)
-async def select_edit_journey_note(message: Message, state: FSMContext) -> None:
+async def select_edit_journey_note(message: Message, state: FSMContext, db_session: AsyncSession, user: User | None) -> None:
     journey_title = message.text
 
-    data = await state.get_data()
-    journeys = data['journeys']
+    journeys = await get_all_user_journeys(db_session=db_session, owner_id=user.id, collections=())
     if journey_title not in [journey.title for journey in journeys]:
         keyboard = journey_list_keyboard(journey_list=journeys)
 
@@ -256,13 +260,13 @@ async def select_edit_journey_note(message: Message, state: FSMContext) -> None:
             reply_markup=keyboard,
         )
     else:
-        user = await get_user_by_telegram_userid(db_session=session, telegram_id=message.from_user.id)
         journey = await get_journey_by_title(
-            db_session=session, journey_title=journey_title, owner_id=user.id
+            db_session=db_session, journey_title=journey_title, owner_id=user.id,
+            collections=('notes',), strategy='joined',
         )
 
         if len(journey.notes) > 0:
-            await state.update_data(journey=journey)
+            await state.update_data(journey_id=journey.id)
             await state.set_state(NoteEditForm.set_note)
             keyboard = journey_note_list_keyboard(journey=journey)
             await message.answer(
@@ -279,11 +283,18 @@ async def select_edit_journey_note(message: Message, state: FSMContext) -> None:
 
 
 @notes_router.message(NoteEditForm.set_note)
-async def select_edit_note(message: Message, state: FSMContext) -> None:
+async def select_edit_note(message: Message, state: FSMContext, db_session: AsyncSession) -> None:
     note_title = message.text
 
     data = await state.get_data()
-    journey = data['journey']
+    journey = await get_journey_by_id(
+        db_session=db_session, journey_id=data['journey_id'],
+        collections=('notes',), strategy='joined',
+    )
+    if journey is None:
+        await state.clear()
+        await message.answer(JOURNEY_NO_LONGER_EXISTS, reply_markup=DEFAULT_KEYBOARD)
+        return
 
     if note_title not in [note.title for note in journey.notes]:
         keyboard = journey_note_list_keyboard(journey=journey)
@@ -293,7 +304,7 @@ async def select_edit_note(message: Message, state: FSMContext) -> None:
         )
     else:
         note = await get_note_by_title(journey=journey, note_title=note_title)
-        await state.update_data(note=note)
+        await state.update_data(note_id=note.id)
         await state.set_state(NoteEditForm.set_edit_field)
         await message.answer(
             '🧐 What do you want to change',
@@ -320,19 +331,32 @@ async def set_edit_field_note(message: Message, state: FSMContext) -> None:
 
 
 @notes_router.message(NoteEditForm.input_edit)
-async def input_field_edit_note(message: Message, state: FSMContext) -> None:
+async def input_field_edit_note(message: Message, state: FSMContext, db_session: AsyncSession) -> None:
     data = await state.get_data()
-    note = data['note']
+    note = await get_note_by_id(db_session=db_session, note_id=data['note_id'])
+    if note is None:
+        await state.clear()
+        await message.answer(NOTE_NO_LONGER_EXISTS, reply_markup=DEFAULT_KEYBOARD)
+        return
 
     if data['edit_field'] == 'Title':
         new_title = message.text
+        journey = await get_journey_by_id(
+            db_session=db_session, journey_id=data['journey_id'],
+            collections=('notes',), strategy='joined',
+        )
         if len(new_title) > 50:
             await message.answer(
                 '⚠️ That is too long for a title. Maybe try something shorter?',
                 reply_markup=DEFAULT_KEYBOARD,
             )
+        elif new_title != note.title and new_title in [other.title for other in journey.notes]:
+            await message.answer(
+                '⚠️ You already have a note with this title associated with this journey. Please, choose another one',
+                reply_markup=DEFAULT_KEYBOARD,
+            )
         else:
-            await update_note(db_session=session, note=note, new_title=new_title)
+            await update_note(db_session=db_session, note=note, new_title=new_title)
             await finish_edit_note(message=message, state=state)
     elif data['edit_field'] == 'Content':
         new_content = message.text
@@ -343,7 +367,7 @@ async def input_field_edit_note(message: Message, state: FSMContext) -> None:
             )
         else:
             await update_note(
-                db_session=session,
+                db_session=db_session,
                 note=note,
                 new_content=new_content,
             )
@@ -359,17 +383,14 @@ async def finish_edit_note(message: Message, state: FSMContext) -> None:
 
 
 @notes_router.message(Command(commands=['remove_note']))
-async def start_remove_journey_note(message: Message, state: FSMContext) -> None:
+async def start_remove_journey_note(message: Message, state: FSMContext, db_session: AsyncSession, user: User | None) -> None:
     await state.clear()
 
-    user = await get_user_by_telegram_userid(db_session=session, telegram_id=message.from_user.id)
-    journeys = await get_all_user_journeys(db_session=session, owner_id=user.id)
+    journeys = await get_all_user_journeys(db_session=db_session, owner_id=user.id, collections=())
 
     if len(journeys) > 0:
         keyboard = journey_list_keyboard(journey_list=journeys)
 
-        await state.update_data(journeys=journeys)
-
         await state.set_state(NoteRemoveForm.set_journey)
         await message.answer(
             '🧐 From which journey do you want to delete a note?',
@@ -384,11 +405,10 @@ async def start_remove_journey_note(message: Message, state: FSMContext) -> None
 
 
 @notes_router.message(NoteRemoveForm.set_journey)
-async def select_remove_journey_note(message: Message, state: FSMContext) -> None:
+async def select_remove_journey_note(message: Message, state: FSMContext, db_session: AsyncSession, user: User | None) -> None:
     journey_title = message.text
 
-    data = await state.get_data()
-    journeys = data['journeys']
+    journeys = await get_all_user_journeys(db_session=db_session, owner_id=user.id, collections=())
     if journey_title not in [journey.title for journey in journeys]:
         keyboard = journey_list_keyboard(journey_list=journeys)
 
@@ -397,13 +417,13 @@ async def select_remove_journey_note(message: Message, state: FSMContext) -> Non
             reply_markup=keyboard,
         )
     else:
-        user = await get_user_by_telegram_userid(db_session=session, telegram_id=message.from_user.id)
         journey = await get_journey_by_title(
-            db_session=session, journey_title=journey_title, owner_id=user.id
+            db_session=db_session, journey_title=journey_title, owner_id=user.id,
+            collections=('notes',), strategy='joined',
         )
 
         if len(journey.notes) > 0:
-            await state.update_data(journey=journey)
+            await state.update_data(journey_id=journey.id)
             await state.set_state(NoteRemoveForm.set_note)
             keyboard = journey_note_list_keyboard(journey=journey)
             await message.answer(
@@ -419,11 +439,19 @@ async def select_remove_journey_note(message: Message, state: FSMContext) -> Non
 
 
 @notes_router.message(NoteRemoveForm.set_note)
-async def select_remove_note(message: Message, state: FSMContext) -> None:
+async def select_remove_note(message: Message, state: FSMContext, db_session: AsyncSession) -> None:
     note_title = message.text
 
     data = await state.get_data()
-    journey = data['journey']
+    journey = await get_journey_by_id(
+        db_session=db_session, journey_id=data['journey_id'],
+        collections=('notes',), strategy='joined',
+    )
+    if journey is None:
+        await state.clear()
+        await message.answer(JOURNEY_NO_LONGER_EXISTS, reply_markup=DEFAULT_KEYBOARD)
+        return
+
     if note_title not in [note.title for note in journey.notes]:
         keyboard = journey_note_list_keyboard(journey=journey)
         await message.answer(
@@ -433,7 +461,7 @@ async def select_remove_note(message: Message, state: FSMContext) -> None:
     else:
         note = await get_note_by_title(journey=journey, note_title=note_title)
         await delete_note(
-            db_session=session,
+            db_session=db_session,
             note=note,
         )
         await finish_remove_note(message=message, state=state)
@@ -3,19 +3,19 @@ from aiogram.filters import Command
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 from aiogram.types import Message
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from data.crud import (
     create_user,
     update_user,
-    get_user_by_telegram_userid,
 )
+from data.models import User
 from data.validators import validate_location
 from ux.keyboards import (
     DEFAULT_KEYBOARD,
     EDIT_USER_PARAMS_KEYBOARD,
 )
 from ux.typical_answers import generate_profile_text
-from settings import session
 
 user_router = Router()
 
@@ -74,7 +74,7 @@ async def add_user_location(message: Message, state: FSMContext) -> None:
 
 
 @user_router.message(UserForm.bio)
-async def add_user_bio(message: Message, state: FSMContext) -> None:
+async def add_user_bio(message: Message, state: FSMContext, db_session: AsyncSession) -> None:
     bio = message.text
     if len(bio) > 200:
         await message.answer(
@@ -85,7 +85,7 @@ async def add_user_bio(message: Message, state: FSMContext) -> None:
     else:
         data = await state.update_data(bio=bio)
         await create_user(
-            db_session=session,
+            db_session=db_session,
             username=message.from_user.username,
             telegram_id=message.from_user.id,
             age=data['age'],
@@ -136,7 +136,7 @@ async def edit_user_info(message: Message, state: FSMContext) -> None:
 
 
 @user_router.message(EditUserForm.edit_age)
-async def edit_user_age(message: Message, state: FSMContext) -> None:
+async def edit_user_age(message: Message, state: FSMContext, db_session: AsyncSession, user: User | None) -> None:
     try:
         age = int(message.text)
         if not (0 <= age <= 122):
@@ -147,9 +147,8 @@ async def edit_user_age(message: Message, state: FSMContext) -> None:
         )
         return
 
-    user = await get_user_by_telegram_userid(db_session=session, telegram_id=message.from_user.id)
     await update_user(
-        db_session=session,
+        db_session=db_session,
         id=user.id,
         new_age=age,
     )
@@ -161,15 +160,14 @@ async def edit_user_age(message: Message, state: FSMContext) -> None:
 
 
 @user_router.message(EditUserForm.edit_location)
-async def edit_user_location(message: Message, state: FSMContext) -> None:
+async def edit_user_location(message: Message, state: FSMContext, db_session: AsyncSession, user: User | None) -> None:
     location = message.text
     try:
         is_valid, _, placename, lat, lon = await validate_location(city=location)
         if is_valid:
             await state.clear()
-            user = await get_user_by_telegram_userid(db_session=session, telegram_id=message.from_user.id)
             await update_user(
-                db_session=session,
+                db_session=db_session,
                 id=user.id,
                 new_living_location=placename,
                 new_lat=lat,
@@ -191,7 +189,7 @@ async def edit_user_location(message: Message, state: FSMContext) -> None:
 
 
 @user_router.message(EditUserForm.edit_bio)
-async def edit_user_bio(message: Message, state: FSMContext) -> None:
+async def edit_user_bio(message: Message, state: FSMContext, db_session: AsyncSession, user: User | None) -> None:
     bio = message.text
     if len(bio) > 200:
         await message.answer(
@@ -199,10 +197,9 @@ async def edit_user_bio(message: Message, state: FSMContext) -> None:
             reply_markup=DEFAULT_KEYBOARD,
         )
     else:
-        user = await get_user_by_telegram_userid(db_session=session, telegram_id=message.from_user.id)
         await state.clear()
         await update_user(
-            db_session=session,
+            db_session=db_session,
             id=user.id,
             new_bio=bio,
         )
@@ -214,9 +211,7 @@ async def edit_user_bio(message: Message, state: FSMContext) -> None:
 
 ''' See User Profile Func '''
 @user_router.message(Command(commands=['profile']))
-async def see_user_profile(message: Message) -> None:
-    user = await get_user_by_telegram_userid(db_session=session, telegram_id=message.from_user.id)
-
+async def see_user_profile(message: Message, user: User | None) -> None:
     await message.answer(
         generate_profile_text(user=user),
         reply_markup=DEFAULT_KEYBOARD,
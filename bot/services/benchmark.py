@@ -0,0 +1,317 @@
+'''
+Benchmarks for the outbound services, run without touching real APIs.
+
+HTTP: `users` simulated handlers share one event loop and each calls a
+local stub upstream that answers after `delay` seconds. Blocking
+`requests` calls (how handlers called APIs before) run one at a time and
+freeze the loop; the shared aiohttp client overlaps them, up to
+CONNECTIONS_PER_HOST at a time. Reports wall time, the response time
+each user sees (from the moment all of them wrote) and the worst event
+loop stall.
+
+Weather: times the previous pandas groupby against aggregate_daily on
+the same hourly arrays and checks both give the same daily values.
+pandas is not a dependency of the bot; install it to run this one.
+
+Render: draws a synthetic multi-leg road route of `points` points the
+way the renderer did before (one two-point Line per segment) and the
+way it does now (each leg simplified and drawn as one polyline). Tiles
+come from a local stub through a throwaway tile store, warmed before
+timing. Reports the median render time and the peak memory traced while
+rendering.
+
+    python -m services.benchmark http [users] [delay]
+    python -m services.benchmark weather [days] [repeats]
+    python -m services.benchmark render [points] [repeats]
+'''
+import asyncio
+from datetime import date
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+from pathlib import Path
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from typing import Awaitable, Callable, Dict, List, Tuple
+
+import numpy as np
+from PIL import Image
+import requests
+from staticmap import CircleMarker, Line
+
+from services import maps, tile_cache
+from services.http import close_http_session, fetch_json
+from services.weather import HOURLY_VARIABLES, aggregate_daily
+
+HTTP_BENCHMARK_USERS = 50
+HTTP_BENCHMARK_DELAY = 0.2
+LOOP_PROBE_INTERVAL = 0.01
+
+WEATHER_BENCHMARK_DAYS = 16
+WEATHER_BENCHMARK_REPEATS = 200
+
+RENDER_BENCHMARK_POINTS = 50_000
+RENDER_BENCHMARK_LEGS = 10
+RENDER_BENCHMARK_REPEATS = 3
+# Degrees per point of the random walk that makes legs wind like roads
+ROUTE_WIGGLE = 0.004
+
+
+class _SlowUpstreamHandler(BaseHTTPRequestHandler):
+    delay = HTTP_BENCHMARK_DELAY
+
+    def do_GET(self) -> None:
+        time.sleep(self.delay)
+        body = b'{"ok":true}'
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *_) -> None:
+        pass
+
+
+class _SlowUpstream(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 256
+
+
+class _TileHandler(BaseHTTPRequestHandler):
+    tile = b''
+
+    def do_GET(self) -> None:
+        self.send_response(200)
+        self.send_header('Content-Type', 'image/png')
+        self.send_header('Content-Length', str(len(self.tile)))
+        self.end_headers()
+        self.wfile.write(self.tile)
+
+    def log_message(self, *_) -> None:
+        pass
+
+
+def _start_upstream(handler: type) -> Tuple[_SlowUpstream, str]:
+    server = _SlowUpstream(('127.0.0.1', 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://127.0.0.1:{server.server_address[1]}/'
+
+
+async def _blocking_handler(url: str) -> None:
+    requests.get(url, timeout=60).json()
+
+
+async def _aiohttp_handler(url: str) -> None:
+    await fetch_json(url, timeout=60)
+
+
+async def _simulate_users(
+    handler: Callable[[str], Awaitable[None]],
+    url: str,
+    users: int,
+) -> Tuple[float, List[float], float]:
+    ''' Returns (wall time, per-user response times, worst loop stall). '''
+    worst_stall = [0.0]
+
+    async def probe() -> None:
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(LOOP_PROBE_INTERVAL)
+            worst_stall[0] = max(worst_stall[0], time.perf_counter() - started - LOOP_PROBE_INTERVAL)
+
+    async def user() -> float:
+        await handler(url)
+        return time.perf_counter() - started
+
+    prober = asyncio.create_task(probe())
+    await asyncio.sleep(0)
+    started = time.perf_counter()
+    latencies = await asyncio.gather(*[user() for _ in range(users)])
+    wall = time.perf_counter() - started
+    # Let the probe wake up once more to record a stall that lasted until now
+    await asyncio.sleep(2 * LOOP_PROBE_INTERVAL)
+    prober.cancel()
+    await close_http_session()
+    return wall, latencies, worst_stall[0]
+
+
+def run_http(users: int = HTTP_BENCHMARK_USERS, delay: float = HTTP_BENCHMARK_DELAY) -> None:
+    users = int(users)
+    server, url = _start_upstream(type('Handler', (_SlowUpstreamHandler,), {'delay': delay}))
+    print(f'{users} concurrent handlers, upstream answers after {delay * 1000:.0f} ms')
+    print(f'{"client":<20}{"wall":>10}{"p50":>10}{"p95":>10}{"max stall":>12}')
+    try:
+        for name, handler in (('requests', _blocking_handler), ('aiohttp', _aiohttp_handler)):
+            wall, latencies, stall = asyncio.run(_simulate_users(handler, url, users))
+            p50 = statistics.median(latencies)
+            p95 = statistics.quantiles(latencies, n=20)[-1]
+            print(
+                f'{name:<20}{wall * 1000:>8.0f}ms{p50 * 1000:>8.0f}ms'
+                f'{p95 * 1000:>8.0f}ms{stall * 1000:>10.0f}ms'
+            )
+    finally:
+        server.shutdown()
+
+
+def _pandas_aggregate_daily(
+    time_start: int,
+    interval: int,
+    hourly: Dict[str, np.ndarray],
+) -> Dict[date, Dict[str, float]]:
+    ''' The previous implementation: a DataFrame grouped by the date string. '''
+    import pandas as pd
+
+    length = min(len(values) for values in hourly.values())
+    hourly_data = {'date': pd.date_range(
+        start=pd.to_datetime(time_start, unit='s', utc=True),
+        periods=length,
+        freq=pd.Timedelta(seconds=interval),
+    )}
+    for variable, values in hourly.items():
+        hourly_data[variable] = values[:length]
+
+    hourly_dataframe = pd.DataFrame(data=hourly_data)
+    hourly_dataframe['date'] = hourly_dataframe['date'].apply(lambda x: str(x).split()[0])
+    grouped = hourly_dataframe.groupby('date').agg(['mean', 'sum', 'min', 'max']).reset_index()
+
+    aggregates = {}
+    for i in range(len(grouped)):
+        year, month, day = map(int, grouped.iloc[i, 0].split('-'))
+        aggregates[date(year, month, day)] = {
+            f'{variable}_{stat}': float(grouped[(variable, stat)].iloc[i])
+            for variable in hourly
+            for stat in ('mean', 'sum', 'min', 'max')
+        }
+    return aggregates
+
+
+def _time(function: Callable[[], object], repeats: int) -> float:
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings)
+
+
+def run_weather(days: int = WEATHER_BENCHMARK_DAYS, repeats: int = WEATHER_BENCHMARK_REPEATS) -> None:
+    try:
+        import pandas
+    except ImportError:
+        sys.exit('The weather benchmark compares against pandas; install it first')
+
+    rng = np.random.default_rng(0)
+    hours = days * 24
+    time_start = int(time.time()) // 86_400 * 86_400
+    hourly = {variable: rng.normal(10, 5, hours) for variable in HOURLY_VARIABLES}
+
+    expected = _pandas_aggregate_daily(time_start, 3600, hourly)
+    actual = aggregate_daily(time_start, 3600, hourly)
+    assert expected.keys() == actual.keys()
+    for day, values in expected.items():
+        for name, value in values.items():
+            assert np.isclose(value, actual[day][name]), (day, name)
+
+    pandas_time = _time(lambda: _pandas_aggregate_daily(time_start, 3600, hourly), repeats)
+    numpy_time = _time(lambda: aggregate_daily(time_start, 3600, hourly), repeats)
+    print(f'pandas {pandas.__version__}, {days} days x {len(HOURLY_VARIABLES)} hourly variables, median of {repeats}')
+    print(f'{"pandas groupby":<20}{pandas_time * 1000:>10.3f} ms')
+    print(f'{"aggregate_daily":<20}{numpy_time * 1000:>10.3f} ms')
+    print(f'{"speedup":<20}{pandas_time / numpy_time:>10.1f} x')
+
+
+def _synthetic_route(points: int, legs: int) -> Tuple[List[Tuple[float, float]], List[np.ndarray]]:
+    ''' Waypoints across Europe joined by winding legs of points // legs points each. '''
+    rng = np.random.default_rng(0)
+    waypoints = rng.uniform((-9.0, 37.0), (30.0, 60.0), (legs + 1, 2))
+    route = []
+    for start, end in zip(waypoints, waypoints[1:]):
+        t = np.linspace(0.0, 1.0, points // legs)[:, np.newaxis]
+        wiggle = np.cumsum(rng.normal(0.0, ROUTE_WIGGLE, (len(t), 2)), axis=0)
+        # Pin both ends of the walk to the waypoints
+        wiggle -= wiggle[0] + t * (wiggle[-1] - wiggle[0])
+        route.append(start + t * (end - start) + wiggle)
+    return [tuple(waypoint) for waypoint in waypoints.tolist()], route
+
+
+def _segment_render_png(
+    coords: List[Tuple[float, float]],
+    route: List[Tuple[float, float]],
+) -> bytes:
+    ''' The previous renderer: one two-point Line per route segment. '''
+    m = tile_cache.CachedStaticMap(
+        maps.MAP_SIZE,
+        maps.MAP_SIZE,
+        maps.MAP_PADDING,
+        tile_request_timeout=maps.TILE_REQUEST_TIMEOUT,
+    )
+    for lon, lat in coords:
+        m.add_marker(CircleMarker((lon, lat), 'blue', maps.MARKER_SIZE))
+
+    point_A = route[0]
+    for coord in route:
+        point_B = coord
+        m.add_line(Line([point_A, point_B], 'black', 3))
+        point_A = point_B
+
+    image = m.render()
+    buffer = BytesIO()
+    image.save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+def _peak_memory(function: Callable[[], object]) -> int:
+    ''' Peak bytes allocated through Python while `function` runs. '''
+    tracemalloc.start()
+    try:
+        function()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def run_render(points: int = RENDER_BENCHMARK_POINTS, repeats: int = RENDER_BENCHMARK_REPEATS) -> None:
+    coords, legs = _synthetic_route(points, RENDER_BENCHMARK_LEGS)
+    route = [tuple(point) for leg in legs for point in leg.tolist()]
+    renderers = {
+        'Line per segment': lambda: _segment_render_png(coords, route),
+        'polyline per leg': lambda: maps._render_map_png(coords, legs),
+    }
+
+    buffer = BytesIO()
+    Image.new('RGB', (maps.TILE_SIZE, maps.TILE_SIZE), (200, 220, 240)).save(buffer, format='PNG')
+    server, url = _start_upstream(type('Handler', (_TileHandler,), {'tile': buffer.getvalue()}))
+    with tempfile.TemporaryDirectory() as directory:
+        # Rendering runs in this process, so the module settings are enough
+        tile_cache.TILE_URL_TEMPLATE = url + '{z}/{x}/{y}.png'
+        tile_cache.TILE_CACHE_DIR = Path(directory)
+        try:
+            results = {}
+            for name, render in renderers.items():
+                # Warms the tile store, so only drawing and encoding are timed
+                render()
+                results[name] = (_time(render, repeats), _peak_memory(render))
+        finally:
+            server.shutdown()
+
+    zoom = maps.fit_zoom(np.concatenate(legs))
+    drawn = sum(
+        len(maps.simplify(maps.project(leg, zoom), maps.SIMPLIFY_TOLERANCE_PX)) for leg in legs
+    )
+    print(f'{len(route):,} route points in {len(legs)} legs, {drawn:,} drawn after simplifying, median of {repeats}')
+    print(f'{"renderer":<20}{"time":>12}{"peak memory":>16}')
+    for name, (elapsed, peak) in results.items():
+        print(f'{name:<20}{elapsed * 1000:>10.0f}ms{peak / 2 ** 20:>13.1f} MiB')
+
+
+if __name__ == '__main__':
+    if sys.argv[1:2] == ['weather']:
+        run_weather(*map(int, sys.argv[2:4]))
+    elif sys.argv[1:2] == ['render']:
+        run_render(*map(int, sys.argv[2:4]))
+    else:
+        run_http(*map(float, sys.argv[2:4]))
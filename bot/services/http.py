@@ -0,0 +1,154 @@
+import asyncio
+import json
+import logging
+from typing import Any, Awaitable, Dict, Iterable, List, Tuple, TypeVar
+
+import aiohttp
+
+
+USER_AGENT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/111.0.0.0 Safari/537.36'
+}
+
+# Connection pool settings shared by every outbound API call
+CONNECTIONS_PER_HOST = 8
+DNS_CACHE_TTL = 300
+KEEPALIVE_TIMEOUT = 30
+DEFAULT_TIMEOUT = 30
+
+# Max number of in-flight requests per upstream API, shared by all users
+UPSTREAM_CONCURRENCY = {
+    'nominatim': 1,
+    'overpass': 2,
+    'open-meteo': 4,
+    'osrm': 4,
+}
+DEFAULT_UPSTREAM_CONCURRENCY = 4
+
+T = TypeVar('T')
+
+__http_session: aiohttp.ClientSession | None = None
+__upstream_semaphores: Dict[str, asyncio.Semaphore] = {}
+
+
+def get_http_session() -> aiohttp.ClientSession:
+    '''
+    Returns the process-wide aiohttp session, creating it on first use.
+    Must be called from inside the running event loop.
+    '''
+    global __http_session
+
+    if __http_session is None or __http_session.closed:
+        connector = aiohttp.TCPConnector(
+            limit_per_host=CONNECTIONS_PER_HOST,
+            ttl_dns_cache=DNS_CACHE_TTL,
+            keepalive_timeout=KEEPALIVE_TIMEOUT,
+        )
+        __http_session = aiohttp.ClientSession(
+            connector=connector,
+            headers=USER_AGENT_HEADERS,
+            timeout=aiohttp.ClientTimeout(total=DEFAULT_TIMEOUT),
+        )
+    return __http_session
+
+
+async def close_http_session() -> None:
+    global __http_session
+
+    if __http_session is not None and not __http_session.closed:
+        await __http_session.close()
+    __http_session = None
+
+
+async def fetch_json(
+    url: str,
+    method: str = 'GET',
+    params: Dict[str, Any] | None = None,
+    data: str | None = None,
+    headers: Dict[str, str] | None = None,
+    timeout: float | None = None,
+) -> Tuple[int | None, Any]:
+    '''
+    Performs a request and decodes the JSON body.
+    Returns (status_code, payload); status_code is None if the request
+    itself failed (timeout, connection error) and payload is None unless
+    the upstream answered with 200.
+    '''
+    status, body = await fetch_bytes(
+        url, method=method, params=params, data=data, headers=headers, timeout=timeout
+    )
+    if status != 200:
+        return status, None
+    try:
+        return status, json.loads(body)
+    except ValueError:
+        return status, None
+
+
+async def fetch_bytes(
+    url: str,
+    method: str = 'GET',
+    params: Dict[str, Any] | None = None,
+    data: str | None = None,
+    headers: Dict[str, str] | None = None,
+    timeout: float | None = None,
+    retries: int = 0,
+    backoff_factor: float = 0.2,
+) -> Tuple[int | None, bytes | None]:
+    session = get_http_session()
+    request_timeout = aiohttp.ClientTimeout(total=timeout) if timeout is not None else None
+
+    for attempt in range(retries + 1):
+        if attempt > 0:
+            await asyncio.sleep(backoff_factor * (2 ** (attempt - 1)))
+        try:
+            async with session.request(
+                method,
+                url,
+                params=params,
+                data=data,
+                headers=headers,
+                timeout=request_timeout,
+            ) as response:
+                body = await response.read()
+                if response.status >= 500 and attempt < retries:
+                    continue
+                return response.status, body
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            if attempt == retries:
+                return None, None
+    return None, None
+
+
+def upstream_semaphore(upstream: str) -> asyncio.Semaphore:
+    semaphore = __upstream_semaphores.get(upstream)
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(
+            UPSTREAM_CONCURRENCY.get(upstream, DEFAULT_UPSTREAM_CONCURRENCY)
+        )
+        __upstream_semaphores[upstream] = semaphore
+    return semaphore
+
+
+async def gather_limited(
+    upstream: str,
+    coroutines: Iterable[Awaitable[T]],
+) -> List[T | None]:
+    '''
+    Runs the coroutines concurrently, at most UPSTREAM_CONCURRENCY[upstream]
+    at a time. Results keep the input order; a coroutine that raised
+    yields None instead of cancelling the others.
+    '''
+    semaphore = upstream_semaphore(upstream)
+
+    async def run(coroutine: Awaitable[T]) -> T:
+        async with semaphore:
+            return await coroutine
+
+    results = await asyncio.gather(
+        *[run(coroutine) for coroutine in coroutines], return_exceptions=True
+    )
+    for result in results:
+        if isinstance(result, Exception):
+            logging.warning('%s request failed: %r', upstream, result)
+    return [None if isinstance(result, Exception) else result for result in results]
@@ -0,0 +1,61 @@
+'''
+Telegram file_id cache for rendered route maps.
+
+A map only depends on the ordered route coordinates, so once Telegram has
+stored the uploaded PNG we can resend it by file_id without routing,
+rendering or uploading again.
+'''
+from collections import OrderedDict
+import hashlib
+from typing import Dict, List, Set, Tuple
+
+MAP_CACHE_SIZE = 4096
+
+# hash -> (journey_id, file_id); a hash is listed in __journey_hashes only
+# under the journey that owns its entry, so the index never outgrows the cache
+__file_ids: 'OrderedDict[str, Tuple[int, str]]' = OrderedDict()
+__journey_hashes: Dict[int, Set[str]] = {}
+
+
+def coords_hash(coords: List[Tuple[float, float]]) -> str:
+    payload = ';'.join(f'{lon:.6f},{lat:.6f}' for lon, lat in coords)
+    return hashlib.sha1(payload.encode()).hexdigest()
+
+
+def _forget_hash(journey_id: int, key: str) -> None:
+    hashes = __journey_hashes.get(journey_id)
+    if hashes is not None:
+        hashes.discard(key)
+        if len(hashes) == 0:
+            del __journey_hashes[journey_id]
+
+
+def get_map_file_id(coords: List[Tuple[float, float]]) -> str | None:
+    key = coords_hash(coords)
+    cached = __file_ids.get(key)
+    if cached is None:
+        return None
+    __file_ids.move_to_end(key)
+    return cached[1]
+
+
+def remember_map_file_id(
+    journey_id: int,
+    coords: List[Tuple[float, float]],
+    file_id: str,
+) -> None:
+    key = coords_hash(coords)
+    previous = __file_ids.pop(key, None)
+    if previous is not None:
+        _forget_hash(previous[0], key)
+    __file_ids[key] = (journey_id, file_id)
+    __journey_hashes.setdefault(journey_id, set()).add(key)
+
+    while len(__file_ids) > MAP_CACHE_SIZE:
+        evicted_key, (evicted_journey_id, _) = __file_ids.popitem(last=False)
+        _forget_hash(evicted_journey_id, evicted_key)
+
+
+def invalidate_journey_map(journey_id: int) -> None:
+    for key in __journey_hashes.pop(journey_id, set()):
+        __file_ids.pop(key, None)
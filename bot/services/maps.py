@@ -0,0 +1,200 @@
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+import logging
+from math import ceil, floor
+import multiprocessing
+from typing import List, Tuple
+
+import numpy as np
+from staticmap import CircleMarker, Line
+
+from services.tile_cache import CachedStaticMap, prefetch_tiles
+
+MAP_RENDER_WORKERS = 2
+# Renders allowed to wait for a worker; further requests are rejected
+MAP_RENDER_QUEUE_SIZE = 8
+MAP_RENDER_TIMEOUT = 60
+TILE_REQUEST_TIMEOUT = 10
+
+MAP_SIZE = 1000
+MAP_PADDING = 10
+MARKER_SIZE = 12
+MAX_ZOOM = 17
+TILE_SIZE = 256
+MAX_LATITUDE = 85.0511
+# Points closer than this to the simplified line are invisible anyway
+SIMPLIFY_TOLERANCE_PX = 0.5
+
+__render_pool: ProcessPoolExecutor | None = None
+__render_slots: asyncio.Semaphore | None = None
+
+
+def project(points: np.ndarray, zoom: int) -> np.ndarray:
+    ''' (lon, lat) degrees to Web Mercator pixel coordinates at `zoom`. '''
+    scale = TILE_SIZE * 2 ** zoom
+    lat = np.radians(np.clip(points[:, 1], -MAX_LATITUDE, MAX_LATITUDE))
+    pixels = np.empty_like(points, dtype=np.float64)
+    pixels[:, 0] = (points[:, 0] + 180.0) / 360.0 * scale
+    pixels[:, 1] = (1.0 - np.arcsinh(np.tan(lat)) / np.pi) / 2.0 * scale
+    return pixels
+
+
+def fit_zoom(points: np.ndarray) -> int:
+    ''' Highest zoom at which all points (and their markers) fit the map. '''
+    usable_width = MAP_SIZE - 2 * (MAP_PADDING + MARKER_SIZE)
+    usable_height = MAP_SIZE - 2 * (MAP_PADDING + MARKER_SIZE)
+    for zoom in range(MAX_ZOOM, -1, -1):
+        pixels = project(points, zoom)
+        if np.ptp(pixels[:, 0]) <= usable_width and np.ptp(pixels[:, 1]) <= usable_height:
+            return zoom
+    return 0
+
+
+def map_tiles(coords: List[Tuple[float, float]]) -> List[Tuple[int, int, int]]:
+    '''
+    (z, x, y) tiles behind the map of `coords`: the zoom fit_zoom picks
+    and the MAP_SIZE window StaticMap centres on the middle of the points.
+    Roads bending outside the waypoints may widen the real map a little.
+    '''
+    points = np.array(coords, dtype=np.float64)
+    zoom = fit_zoom(points)
+    center = (points.min(axis=0) + points.max(axis=0)) / 2
+    center_x, center_y = project(center[np.newaxis], zoom)[0] / TILE_SIZE
+    half = MAP_SIZE / TILE_SIZE / 2
+    count = 2 ** zoom
+    return [
+        (zoom, x % count, y % count)
+        for x in range(floor(center_x - half), ceil(center_x + half))
+        for y in range(floor(center_y - half), ceil(center_y + half))
+    ]
+
+
+def simplify(pixels: np.ndarray, tolerance: float) -> np.ndarray:
+    '''
+    Douglas-Peucker on pixel coordinates. Returns the indices of the kept
+    points, always including both ends.
+    '''
+    count = len(pixels)
+    if count <= 2:
+        return np.arange(count)
+
+    keep = np.zeros(count, dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, count - 1)]
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2:
+            continue
+
+        start, end = pixels[first], pixels[last]
+        segment = end - start
+        inner = pixels[first + 1 : last] - start
+        length = np.hypot(*segment)
+        if length == 0:
+            distances = np.hypot(inner[:, 0], inner[:, 1])
+        else:
+            distances = np.abs(segment[0] * inner[:, 1] - segment[1] * inner[:, 0]) / length
+
+        farthest = int(np.argmax(distances))
+        if distances[farthest] > tolerance:
+            index = first + 1 + farthest
+            keep[index] = True
+            stack.append((first, index))
+            stack.append((index, last))
+    return np.flatnonzero(keep)
+
+
+def _render_map_png(
+    coords: List[Tuple[float, float]],
+    legs: List[np.ndarray],
+) -> bytes:
+    '''
+    Runs in a worker process: downloads tiles, draws the map and encodes
+    it as PNG. Each leg is simplified for the map zoom and drawn as a
+    single polyline.
+    '''
+    waypoints = np.array(coords, dtype=np.float64)
+    zoom = fit_zoom(np.concatenate([waypoints] + legs))
+
+    m = CachedStaticMap(
+        MAP_SIZE, MAP_SIZE, MAP_PADDING, tile_request_timeout=TILE_REQUEST_TIMEOUT
+    )
+    for lon, lat in coords:
+        m.add_marker(CircleMarker((lon, lat), 'blue', MARKER_SIZE))
+
+    for leg in legs:
+        kept = simplify(project(leg, zoom), tolerance=SIMPLIFY_TOLERANCE_PX)
+        m.add_line(Line(leg[kept].tolist(), 'black', 3))
+
+    image = m.render(zoom=zoom)
+    buffer = BytesIO()
+    image.save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+def _get_render_pool() -> ProcessPoolExecutor:
+    global __render_pool
+
+    if __render_pool is None:
+        __render_pool = ProcessPoolExecutor(
+            max_workers=MAP_RENDER_WORKERS,
+            mp_context=multiprocessing.get_context('spawn'),
+        )
+    return __render_pool
+
+
+async def render_map(
+    coords: List[Tuple[float, float]],
+    legs: List[np.ndarray],
+) -> bytes | None:
+    '''
+    Renders the map in the worker pool and returns the PNG bytes.
+    Returns None if the queue is full, the render timed out or failed.
+    '''
+    global __render_slots
+
+    if __render_slots is None:
+        __render_slots = asyncio.Semaphore(MAP_RENDER_WORKERS + MAP_RENDER_QUEUE_SIZE)
+    if __render_slots.locked():
+        return None
+
+    async with __render_slots:
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(_get_render_pool(), _render_map_png, coords, legs)
+        try:
+            return await asyncio.wait_for(future, timeout=MAP_RENDER_TIMEOUT)
+        except asyncio.TimeoutError:
+            logging.warning('Map render timed out after %s s', MAP_RENDER_TIMEOUT)
+            return None
+        except Exception as e:
+            logging.warning('Map render failed: %r', e)
+            return None
+
+
+async def shutdown_map_renderer() -> None:
+    global __render_pool
+
+    if __render_pool is not None:
+        __render_pool.shutdown(wait=False, cancel_futures=True)
+        __render_pool = None
+
+
+if __name__ == '__main__':
+    # Warms the tile store with the maps of the journeys planned so far,
+    # fetching only the tiles those maps are drawn from
+    from sqlalchemy import select
+    from sqlalchemy.orm import selectinload
+
+    from data.models import Journey, User
+    from settings import session as db_session
+
+    homes = {user.id: (user.lon, user.lat) for user in db_session.scalars(select(User))}
+    tiles = set()
+    for journey in db_session.scalars(select(Journey).options(selectinload(Journey.locations))):
+        if journey.owner_id in homes and len(journey.locations) > 0:
+            coords = [homes[journey.owner_id]]
+            coords += [(location.lon, location.lat) for location in journey.locations]
+            tiles.update(map_tiles(coords))
+    db_session.remove()
+    print(f'Prefetched {prefetch_tiles(sorted(tiles))} of {len(tiles)} tiles')
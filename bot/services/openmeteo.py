@@ -0,0 +1,27 @@
+from typing import Any, Dict, List
+
+from openmeteo_sdk.WeatherApiResponse import WeatherApiResponse
+
+from services.http import fetch_bytes
+
+
+async def weather_api(url: str, params: Dict[str, Any]) -> List[WeatherApiResponse]:
+    '''
+    Async replacement for openmeteo_requests.Client.weather_api.
+    Requests the flatbuffers format through the shared HTTP session and
+    splits the body into one WeatherApiResponse per requested location.
+    '''
+    params = {**params, 'format': 'flatbuffers'}
+
+    status_code, data = await fetch_bytes(url, params=params, timeout=15, retries=5)
+    if status_code != 200 or data is None:
+        raise RuntimeError(f'Open-Meteo request failed [{status_code}]')
+
+    messages = []
+    total = len(data)
+    pos = 0
+    while pos < total:
+        length = int.from_bytes(data[pos : pos + 4], byteorder='little')
+        messages.append(WeatherApiResponse.GetRootAs(data, pos + 4))
+        pos += length + 4
+    return messages
@@ -0,0 +1,198 @@
+import asyncio
+from math import asin, cos, radians, sin, sqrt
+from typing import Any, Dict, List, Set, Tuple
+
+from services.http import fetch_json, upstream_semaphore
+from services.poi_cache import PoiCacheKey, cache_key, geohash_bounds, get_pois, put_pois
+
+OVERPASS_URL = 'http://overpass-api.de/api/interpreter'
+EARTH_RADIUS_METERS = 6_371_000
+# Translated names kept in the cache next to the plain `name` tag
+POI_NAME_LANGUAGES = ('en',)
+
+__refreshing: Set[PoiCacheKey] = set()
+__refresh_tasks: Set[asyncio.Task] = set()
+
+# Element selectors queried for every category of places
+POI_SELECTORS = {
+    'sights': [
+        'node["tourism"="attraction"]',
+        'way["tourism"="attraction"]',
+        'relation["tourism"="attraction"]',
+    ],
+    'hotels': [
+        'node["tourism"="hotel"]',
+    ],
+    'restaurants': [
+        'node["amenity"="restaurant"]',
+        'way["amenity"="restaurant"]',
+        'relation["amenity"="restaurant"]',
+    ],
+}
+
+
+def haversine_meters(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    lat1, lon1, lat2, lon2 = map(radians, (lat1, lon1, lat2, lon2))
+    a = sin((lat2 - lat1) / 2) ** 2 + cos(lat1) * cos(lat2) * sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_METERS * asin(sqrt(a))
+
+
+def build_batched_query(
+    selectors: List[str],
+    points: List[Tuple[float, float]],
+    radius_meters: int,
+) -> str:
+    '''
+    One union query covering every (selector, point) pair.
+    `out center` gives ways and relations a coordinate to split results by.
+    '''
+    statements = [
+        f'{selector}(around:{radius_meters},{lat},{lon});'
+        for lat, lon in points
+        for selector in selectors
+    ]
+    body = '\n            '.join(statements)
+    return f'''
+        [out:json][timeout:60];
+        (
+            {body}
+        );
+        out center;
+    '''
+
+
+def element_coords(element: Dict[str, Any]) -> Tuple[float, float] | None:
+    if 'lat' in element and 'lon' in element:
+        return element['lat'], element['lon']
+    if 'center' in element:
+        return element['center']['lat'], element['center']['lon']
+    return None
+
+
+def compact_element(element: Dict[str, Any]) -> Dict[str, Any] | None:
+    '''
+    Keeps only what the handlers read: coordinates and the name tags.
+    Unnamed elements are never shown, so they are dropped (None).
+    '''
+    tags = element.get('tags', {})
+    coords = element_coords(element)
+    if 'name' not in tags or coords is None:
+        return None
+
+    names = {'name': tags['name']}
+    for language in POI_NAME_LANGUAGES:
+        if f'name:{language}' in tags:
+            names[f'name:{language}'] = tags[f'name:{language}']
+    lat, lon = coords
+    return {'lat': lat, 'lon': lon, 'tags': names}
+
+
+def split_elements_by_point(
+    elements: List[Dict[str, Any]],
+    points: List[Tuple[float, float]],
+    radius_meters: int,
+) -> List[List[Dict[str, Any]]]:
+    '''
+    Hands every returned element to each point it lies within radius of,
+    so each point gets what a separate `around` query would have returned.
+    '''
+    per_point: List[List[Dict[str, Any]]] = [[] for _ in points]
+    # Way/relation centers can sit just outside the circle the way intersects
+    max_distance = radius_meters * 1.05
+
+    for element in elements:
+        coords = element_coords(element)
+        if coords is None:
+            continue
+        for i, (lat, lon) in enumerate(points):
+            if haversine_meters(lat, lon, *coords) <= max_distance:
+                per_point[i].append(element)
+    return per_point
+
+
+def _cell_center_and_reach(cell: str, radius_meters: int) -> Tuple[float, float, float]:
+    ''' Center of a geohash cell and the radius covering `radius_meters` around any point in it. '''
+    lat_min, lat_max, lon_min, lon_max = geohash_bounds(cell)
+    lat, lon = (lat_min + lat_max) / 2, (lon_min + lon_max) / 2
+    return lat, lon, radius_meters + haversine_meters(lat, lon, lat_max, lon_max)
+
+
+async def _fetch_cells(
+    keys: List[PoiCacheKey],
+) -> Dict[PoiCacheKey, List[Dict[str, Any]]] | None:
+    ''' Queries Overpass once for all cache cells of one category and radius bucket. '''
+    _, category, bucket = keys[0]
+    centers = [_cell_center_and_reach(cell, bucket) for cell, _, _ in keys]
+    points = [(lat, lon) for lat, lon, _ in centers]
+    reach = max(int(cell_reach) + 1 for _, _, cell_reach in centers)
+
+    query = build_batched_query(POI_SELECTORS[category], points, reach)
+    async with upstream_semaphore('overpass'):
+        status_code, json = await fetch_json(OVERPASS_URL, method='POST', data=query, timeout=90)
+
+    if status_code != 200 or json is None:
+        return None
+
+    elements = [compact_element(element) for element in json['elements']]
+    elements = [element for element in elements if element is not None]
+    elements_per_cell = split_elements_by_point(elements, points, reach)
+    for key, elements in zip(keys, elements_per_cell):
+        put_pois(key, elements)
+    return dict(zip(keys, elements_per_cell))
+
+
+async def _refresh_cells(keys: List[PoiCacheKey]) -> None:
+    try:
+        await _fetch_cells(keys)
+    finally:
+        __refreshing.difference_update(keys)
+
+
+def _schedule_refresh(keys: List[PoiCacheKey]) -> None:
+    keys = [key for key in keys if key not in __refreshing]
+    if len(keys) == 0:
+        return
+    __refreshing.update(keys)
+    task = asyncio.create_task(_refresh_cells(keys))
+    __refresh_tasks.add(task)
+    task.add_done_callback(__refresh_tasks.discard)
+
+
+async def fetch_pois_near_points(
+    category: str,
+    points: List[Tuple[float, float]],
+    radius_meters: int,
+) -> List[List[Dict[str, Any]] | None]:
+    '''
+    Elements of `category` within `radius_meters` of each point, in order.
+    Served from the geohash-tiled cache where possible; stale cells are
+    returned as-is and refreshed in the background, and all missing cells
+    are fetched with a single Overpass request. A point whose cell could
+    not be fetched gets None.
+    '''
+    keys = [cache_key(lat, lon, category, radius_meters) for lat, lon in points]
+
+    cells: Dict[PoiCacheKey, List[Dict[str, Any]]] = {}
+    missing, stale = [], []
+    for key in dict.fromkeys(keys):
+        cached = get_pois(key)
+        if cached is None:
+            missing.append(key)
+            continue
+        elements, is_fresh = cached
+        cells[key] = elements
+        if not is_fresh:
+            stale.append(key)
+
+    if len(stale) > 0:
+        _schedule_refresh(stale)
+    if len(missing) > 0:
+        cells.update(await _fetch_cells(missing) or {})
+
+    elements_per_point = []
+    for point, key in zip(points, keys):
+        if key not in cells:
+            elements_per_point.append(None)
+            continue
+        elements_per_point.append(split_elements_by_point(cells[key], [point], radius_meters)[0])
+    return elements_per_point
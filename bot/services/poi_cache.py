@@ -0,0 +1,130 @@
+'''
+Spatial cache for Overpass results.
+
+Entries are keyed by (geohash cell, POI category, radius bucket) and hold
+every element within the bucket radius of any point of the cell, so all
+locations falling into one cell share a single upstream query. Elements
+are stored compacted to their coordinates and name tags, and the cache
+is bounded both by entry count and by approximate size in bytes.
+'''
+from collections import OrderedDict
+import time
+from typing import Any, Dict, List, Tuple
+
+GEOHASH_PRECISION = 5
+RADIUS_BUCKETS = (1_000, 2_000, 5_000, 7_000, 10_000, 15_000, 25_000)
+FRESH_FOR = 24 * 3600
+STALE_FOR = 7 * 24 * 3600
+MAX_ENTRIES = 2048
+MAX_BYTES = 64 * 1024 * 1024
+# Rough cost of one compact element (dicts, floats) besides its tag strings
+ELEMENT_OVERHEAD_BYTES = 600
+
+PoiCacheKey = Tuple[str, str, int]
+
+_GEOHASH_ALPHABET = '0123456789bcdefghjkmnpqrstuvwxyz'
+
+__entries: 'OrderedDict[PoiCacheKey, Tuple[float, List[Dict[str, Any]], int]]' = OrderedDict()
+__total_bytes = 0
+
+
+def geohash_encode(lat: float, lon: float, precision: int = GEOHASH_PRECISION) -> str:
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    chars = []
+    bits = 0
+    bit_count = 0
+    even = True
+    while len(chars) < precision:
+        value, value_range = (lon, lon_range) if even else (lat, lat_range)
+        middle = (value_range[0] + value_range[1]) / 2
+        if value >= middle:
+            bits = (bits << 1) | 1
+            value_range[0] = middle
+        else:
+            bits <<= 1
+            value_range[1] = middle
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(_GEOHASH_ALPHABET[bits])
+            bits = 0
+            bit_count = 0
+    return ''.join(chars)
+
+
+def geohash_bounds(cell: str) -> Tuple[float, float, float, float]:
+    ''' (lat_min, lat_max, lon_min, lon_max) of a geohash cell. '''
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    even = True
+    for char in cell:
+        bits = _GEOHASH_ALPHABET.index(char)
+        for shift in range(4, -1, -1):
+            value_range = lon_range if even else lat_range
+            middle = (value_range[0] + value_range[1]) / 2
+            if (bits >> shift) & 1:
+                value_range[0] = middle
+            else:
+                value_range[1] = middle
+            even = not even
+    return lat_range[0], lat_range[1], lon_range[0], lon_range[1]
+
+
+def radius_bucket(radius_meters: int) -> int:
+    for bucket in RADIUS_BUCKETS:
+        if radius_meters <= bucket:
+            return bucket
+    return radius_meters
+
+
+def cache_key(lat: float, lon: float, category: str, radius_meters: int) -> PoiCacheKey:
+    return geohash_encode(lat, lon), category, radius_bucket(radius_meters)
+
+
+def get_pois(key: PoiCacheKey) -> Tuple[List[Dict[str, Any]], bool] | None:
+    '''
+    Returns (elements, is_fresh), or None if the key is unknown or too old
+    to be served even as stale.
+    '''
+    cached = __entries.get(key)
+    if cached is None:
+        return None
+
+    stored_at, elements, _ = cached
+    age = time.monotonic() - stored_at
+    if age > STALE_FOR:
+        _drop(key)
+        return None
+
+    __entries.move_to_end(key)
+    return elements, age <= FRESH_FOR
+
+
+def approximate_size(elements: List[Dict[str, Any]]) -> int:
+    return sum(
+        ELEMENT_OVERHEAD_BYTES
+        + sum(len(name) + len(value) for name, value in element.get('tags', {}).items())
+        for element in elements
+    )
+
+
+def poi_cache_stats() -> Dict[str, int]:
+    return {'entries': len(__entries), 'bytes': __total_bytes}
+
+
+def _drop(key: PoiCacheKey) -> None:
+    global __total_bytes
+    _, _, size = __entries.pop(key)
+    __total_bytes -= size
+
+
+def put_pois(key: PoiCacheKey, elements: List[Dict[str, Any]]) -> None:
+    global __total_bytes
+    if key in __entries:
+        _drop(key)
+    size = approximate_size(elements)
+    __entries[key] = (time.monotonic(), elements, size)
+    __total_bytes += size
+    while len(__entries) > MAX_ENTRIES or (__total_bytes > MAX_BYTES and len(__entries) > 1):
+        _drop(next(iter(__entries)))
@@ -0,0 +1,54 @@
+'''
+Cache of routed legs keyed by their ordered (start, end) coordinates.
+
+A journey's route is the concatenation of its legs, so after a location
+is added, edited or removed only the legs touching it miss the cache.
+Legs such as home -> capital are shared between users as well.
+'''
+from collections import OrderedDict
+import time
+from typing import Tuple
+
+import numpy as np
+
+# ~0.1 m; coordinates come from geocoding, so equal places compare equal
+LEG_COORDS_PRECISION = 6
+LEG_EXPIRE_AFTER = 7 * 24 * 3600
+MAX_LEGS = 8192
+
+LegKey = Tuple[float, float, float, float]
+
+__legs: 'OrderedDict[LegKey, Tuple[float, np.ndarray]]' = OrderedDict()
+
+
+def leg_key(start_coords: Tuple[float, float], end_coords: Tuple[float, float]) -> LegKey:
+    return tuple(round(value, LEG_COORDS_PRECISION) for value in (*start_coords, *end_coords))
+
+
+def get_leg(
+    start_coords: Tuple[float, float],
+    end_coords: Tuple[float, float],
+) -> np.ndarray | None:
+    key = leg_key(start_coords, end_coords)
+    cached = __legs.get(key)
+    if cached is None:
+        return None
+
+    stored_at, leg = cached
+    if time.monotonic() - stored_at > LEG_EXPIRE_AFTER:
+        del __legs[key]
+        return None
+    __legs.move_to_end(key)
+    return leg
+
+
+def put_leg(
+    start_coords: Tuple[float, float],
+    end_coords: Tuple[float, float],
+    leg: np.ndarray,
+) -> None:
+    key = leg_key(start_coords, end_coords)
+    __legs[key] = (time.monotonic(), leg)
+    __legs.move_to_end(key)
+    while len(__legs) > MAX_LEGS:
+        __legs.popitem(last=False)
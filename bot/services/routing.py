@@ -0,0 +1,153 @@
+from array import array
+import asyncio
+from typing import List, Tuple
+
+import numpy as np
+
+from services.http import fetch_json, gather_limited, upstream_semaphore
+from services.route_cache import get_leg, put_leg
+
+OSRM_ROUTE_URL = 'https://router.project-osrm.org/route/v1/driving'
+# Full-resolution geometry as a precision-6 encoded polyline, no steps
+OSRM_ROUTE_PARAMS = {'overview': 'full', 'geometries': 'polyline6', 'steps': 'false'}
+POLYLINE6_SCALE = 1e6
+
+
+def _coords_path(coords: List[Tuple[float, float]]) -> str:
+    return ';'.join(f'{lon},{lat}' for lon, lat in coords)
+
+
+def _straight_leg(
+    start_coords: Tuple[float, float],
+    end_coords: Tuple[float, float],
+) -> np.ndarray:
+    return np.array([start_coords, end_coords], dtype=np.float64)
+
+
+def decode_polyline(encoded: str, scale: float = POLYLINE6_SCALE) -> np.ndarray:
+    '''
+    Decodes an encoded polyline into an (n, 2) array of (lon, lat).
+    Values are accumulated straight into a flat array('d'), which NumPy
+    then views without copying.
+    '''
+    values = array('d')
+    data = encoded.encode('ascii')
+    lat = lon = 0
+    index, length = 0, len(data)
+    while index < length:
+        for axis in (0, 1):
+            result = shift = 0
+            while True:
+                byte = data[index] - 63
+                index += 1
+                result |= (byte & 0x1f) << shift
+                shift += 5
+                if byte < 0x20:
+                    break
+            delta = ~(result >> 1) if result & 1 else result >> 1
+            if axis == 0:
+                lat += delta
+            else:
+                lon += delta
+        values.append(lon / scale)
+        values.append(lat / scale)
+    return np.frombuffer(values, dtype=np.float64).reshape(-1, 2)
+
+
+def split_legs(geometry: np.ndarray, waypoints: List[Tuple[float, float]]) -> List[np.ndarray]:
+    '''
+    Cuts a whole-route geometry into legs at the vertices closest to the
+    snapped waypoints, searching forward so loops are split in order.
+    '''
+    cuts = [0]
+    for lon, lat in waypoints[1:-1]:
+        start = cuts[-1]
+        distances = np.hypot(geometry[start:, 0] - lon, geometry[start:, 1] - lat)
+        cuts.append(start + int(np.argmin(distances)))
+    cuts.append(len(geometry) - 1)
+    return [geometry[first : last + 1] for first, last in zip(cuts, cuts[1:])]
+
+
+async def fetch_single_route(
+    start_coords: Tuple[float, float],
+    end_coords: Tuple[float, float],
+) -> np.ndarray | None:
+    url = f'{OSRM_ROUTE_URL}/{_coords_path([start_coords, end_coords])}'
+    _, data = await fetch_json(url, params=OSRM_ROUTE_PARAMS, timeout=15)
+
+    if data is None or data['code'] != 'Ok':
+        return None
+
+    return decode_polyline(data['routes'][0]['geometry'])
+
+
+async def fetch_full_route(
+    coords: List[Tuple[float, float]],
+) -> List[np.ndarray] | None:
+    '''
+    Routes through every waypoint with a single OSRM request.
+    Returns None if OSRM could not build the whole itinerary.
+    '''
+    url = f'{OSRM_ROUTE_URL}/{_coords_path(coords)}'
+    async with upstream_semaphore('osrm'):
+        _, data = await fetch_json(url, params=OSRM_ROUTE_PARAMS, timeout=30)
+
+    if data is None or data['code'] != 'Ok':
+        return None
+
+    geometry = decode_polyline(data['routes'][0]['geometry'])
+    waypoints = [tuple(waypoint['location']) for waypoint in data['waypoints']]
+    return split_legs(geometry, waypoints)
+
+
+async def fetch_legs(coords: List[Tuple[float, float]]) -> List[np.ndarray | None]:
+    '''
+    Routes consecutive waypoints, one request for the whole run, falling
+    back to concurrent per-leg requests. Unroutable legs are None.
+    '''
+    legs = await fetch_full_route(coords=coords)
+    if legs is not None:
+        return legs
+
+    return await gather_limited(
+        'osrm',
+        [
+            fetch_single_route(start_coords=start_coords, end_coords=end_coords)
+            for start_coords, end_coords in zip(coords, coords[1:])
+        ],
+    )
+
+
+async def fetch_route(coords: List[Tuple[float, float]]) -> List[np.ndarray]:
+    '''
+    Road route through `coords` (lon, lat) in order, one (n, 2) float
+    array of (lon, lat) points per leg. Legs are served from the route
+    cache; each run of consecutive uncached legs is routed with one OSRM
+    request. Legs OSRM cannot route are drawn as straight lines.
+    '''
+    pairs = list(zip(coords, coords[1:]))
+    legs = [get_leg(start_coords, end_coords) for start_coords, end_coords in pairs]
+
+    # Runs of missing legs as [first, last) leg index ranges
+    runs = []
+    for i, leg in enumerate(legs):
+        if leg is not None:
+            continue
+        if len(runs) > 0 and runs[-1][1] == i:
+            runs[-1][1] = i + 1
+        else:
+            runs.append([i, i + 1])
+
+    fetched_runs = await asyncio.gather(
+        *[fetch_legs(coords=coords[first : last + 1]) for first, last in runs]
+    )
+    for (first, _), fetched in zip(runs, fetched_runs):
+        for i, leg in enumerate(fetched, start=first):
+            if leg is not None:
+                put_leg(*pairs[i], leg)
+                legs[i] = leg
+
+    return [
+        leg if leg is not None else _straight_leg(start_coords, end_coords)
+        for leg, (start_coords, end_coords) in zip(legs, pairs)
+    ]
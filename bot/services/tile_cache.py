@@ -0,0 +1,231 @@
+'''
+Persistent map tile store shared by all render workers.
+
+Tiles are appended to a single pack file and addressed by (z, x, y)
+through a small SQLite index next to it. Reads go through a read-only
+memory map of the pack. SQLite's write lock serializes appends between
+worker processes. When the pack outgrows TILE_CACHE_MAX_BYTES the
+least recently used tiles are dropped by rewriting the kept ones into
+a new pack generation.
+
+The tile server and the store location come from the TILE_URL_TEMPLATE
+and TILE_CACHE_DIR environment variables when set. Render workers are
+spawned, so they inherit them from the bot process.
+'''
+import mmap
+import os
+from pathlib import Path
+import re
+import sqlite3
+import threading
+import time
+from typing import Iterable, Tuple
+
+import requests
+from staticmap import StaticMap
+
+TILE_URL_TEMPLATE = os.environ.get(
+    'TILE_URL_TEMPLATE', 'https://a.tile.openstreetmap.org/{z}/{x}/{y}.png'
+)
+TILE_CACHE_DIR = Path(
+    os.environ.get('TILE_CACHE_DIR', Path(__file__).parent.parent / 'db' / 'tiles')
+)
+TILE_CACHE_MAX_BYTES = 512 * 1024 * 1024
+# After eviction the pack is shrunk to this share of the cap
+TILE_CACHE_EVICT_TO = 0.8
+# last_used is only rewritten when older than this, to keep reads cheap
+TOUCH_INTERVAL = 300
+
+TILE_URL_PATTERN = re.compile(r'/(\d+)/(\d+)/(\d+)\.png')
+
+# StaticMap fetches tiles from a thread pool: one SQLite connection per
+# thread, and the shared pack view is guarded by a lock
+__local = threading.local()
+__pack_lock = threading.Lock()
+__pack: mmap.mmap | None = None
+__pack_generation: int | None = None
+
+
+def _pack_path(generation: int) -> Path:
+    return TILE_CACHE_DIR / f'tiles.{generation}.pack'
+
+
+def _connect() -> sqlite3.Connection:
+    connection = getattr(__local, 'connection', None)
+    if connection is None:
+        TILE_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        connection = sqlite3.connect(
+            TILE_CACHE_DIR / 'index.sqlite3', timeout=30, isolation_level=None
+        )
+        connection.executescript('''
+            CREATE TABLE IF NOT EXISTS tiles (
+                z INTEGER NOT NULL,
+                x INTEGER NOT NULL,
+                y INTEGER NOT NULL,
+                offset INTEGER NOT NULL,
+                length INTEGER NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (z, x, y)
+            );
+            CREATE TABLE IF NOT EXISTS pack (
+                id INTEGER PRIMARY KEY CHECK (id = 0),
+                generation INTEGER NOT NULL,
+                size INTEGER NOT NULL
+            );
+            INSERT OR IGNORE INTO pack (id, generation, size) VALUES (0, 0, 0);
+        ''')
+        __local.connection = connection
+    return connection
+
+
+def _current_pack(connection: sqlite3.Connection) -> Tuple[int, int]:
+    return connection.execute('SELECT generation, size FROM pack WHERE id = 0').fetchone()
+
+
+def _pack_view(generation: int, needed_size: int) -> mmap.mmap | None:
+    ''' Read-only map of the pack, remapped when it grew or was compacted. Needs __pack_lock. '''
+    global __pack, __pack_generation
+
+    if __pack is None or __pack_generation != generation or len(__pack) < needed_size:
+        if __pack is not None:
+            __pack.close()
+            __pack = None
+        path = _pack_path(generation)
+        if not path.exists() or path.stat().st_size == 0:
+            return None
+        with open(path, 'rb') as file:
+            __pack = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        __pack_generation = generation
+    return __pack
+
+
+def get_tile(z: int, x: int, y: int) -> bytes | None:
+    connection = _connect()
+    # One statement, so the offset always matches the pack generation
+    row = connection.execute(
+        'SELECT tiles.offset, tiles.length, tiles.last_used, pack.generation '
+        'FROM tiles, pack WHERE pack.id = 0 AND z = ? AND x = ? AND y = ?',
+        (z, x, y),
+    ).fetchone()
+    if row is None:
+        return None
+
+    offset, length, last_used, generation = row
+    with __pack_lock:
+        pack = _pack_view(generation, offset + length)
+        if pack is None or len(pack) < offset + length:
+            return None
+        data = pack[offset : offset + length]
+
+    now = time.time()
+    if now - last_used > TOUCH_INTERVAL:
+        connection.execute(
+            'UPDATE tiles SET last_used = ? WHERE z = ? AND x = ? AND y = ?', (now, z, x, y)
+        )
+    return data
+
+
+def put_tile(z: int, x: int, y: int, data: bytes) -> None:
+    connection = _connect()
+    connection.execute('BEGIN IMMEDIATE')
+    try:
+        generation, size = _current_pack(connection)
+        with open(_pack_path(generation), 'ab') as file:
+            offset = file.tell()
+            file.write(data)
+        connection.execute(
+            'INSERT OR REPLACE INTO tiles (z, x, y, offset, length, last_used) '
+            'VALUES (?, ?, ?, ?, ?, ?)',
+            (z, x, y, offset, len(data), time.time()),
+        )
+        connection.execute('UPDATE pack SET size = ? WHERE id = 0', (offset + len(data),))
+        connection.execute('COMMIT')
+    except BaseException:
+        connection.execute('ROLLBACK')
+        raise
+
+    if offset + len(data) > TILE_CACHE_MAX_BYTES:
+        evict_tiles()
+
+
+def evict_tiles() -> None:
+    ''' Rewrites the most recently used tiles into a fresh pack generation. '''
+    connection = _connect()
+    connection.execute('BEGIN IMMEDIATE')
+    try:
+        generation, size = _current_pack(connection)
+        if size <= TILE_CACHE_MAX_BYTES:
+            connection.execute('ROLLBACK')
+            return
+
+        rows = connection.execute(
+            'SELECT z, x, y, offset, length FROM tiles ORDER BY last_used DESC'
+        ).fetchall()
+        budget = int(TILE_CACHE_MAX_BYTES * TILE_CACHE_EVICT_TO)
+
+        new_generation = generation + 1
+        new_size = 0
+        with open(_pack_path(generation), 'rb') as old_pack, \
+                open(_pack_path(new_generation), 'wb') as new_pack:
+            for z, x, y, offset, length in rows:
+                if new_size + length > budget:
+                    connection.execute(
+                        'DELETE FROM tiles WHERE z = ? AND x = ? AND y = ?', (z, x, y)
+                    )
+                    continue
+                old_pack.seek(offset)
+                new_pack.write(old_pack.read(length))
+                connection.execute(
+                    'UPDATE tiles SET offset = ? WHERE z = ? AND x = ? AND y = ?',
+                    (new_size, z, x, y),
+                )
+                new_size += length
+
+        connection.execute(
+            'UPDATE pack SET generation = ?, size = ? WHERE id = 0', (new_generation, new_size)
+        )
+        connection.execute('COMMIT')
+    except BaseException:
+        connection.execute('ROLLBACK')
+        raise
+
+    # Processes still mapping the old pack keep their view until they remap
+    os.remove(_pack_path(generation))
+
+
+def download_tile(z: int, x: int, y: int, **kwargs) -> Tuple[int | None, bytes | None]:
+    data = get_tile(z, x, y)
+    if data is not None:
+        return 200, data
+
+    response = requests.get(TILE_URL_TEMPLATE.format(z=z, x=x, y=y), **kwargs)
+    if response.status_code == 200:
+        put_tile(z, x, y, response.content)
+    return response.status_code, response.content
+
+
+class CachedStaticMap(StaticMap):
+    ''' StaticMap that reads and fills the shared tile store. '''
+
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault('url_template', TILE_URL_TEMPLATE)
+        super().__init__(*args, **kwargs)
+
+    def get(self, url, **kwargs):
+        match = TILE_URL_PATTERN.search(url)
+        if match is None:
+            return super().get(url, **kwargs)
+        z, x, y = map(int, match.groups())
+        return download_tile(z, x, y, **kwargs)
+
+
+def prefetch_tiles(tiles: Iterable[Tuple[int, int, int]]) -> int:
+    ''' Downloads the missing (z, x, y) tiles one by one. Returns how many were fetched. '''
+    fetched = 0
+    for z, x, y in tiles:
+        if get_tile(z, x, y) is not None:
+            continue
+        status_code, _ = download_tile(z, x, y, timeout=10, headers={'User-Agent': 'StaticMap'})
+        if status_code == 200:
+            fetched += 1
+    return fetched
@@ -0,0 +1,209 @@
+import asyncio
+from collections import OrderedDict
+from datetime import date, timedelta
+import time
+from typing import Dict, List, Tuple
+
+import numpy as np
+from openmeteo_sdk.WeatherApiResponse import WeatherApiResponse
+
+from data.models import Location
+from services.http import upstream_semaphore
+from services.openmeteo import weather_api
+
+FORECAST_URL = 'https://api.open-meteo.com/v1/forecast'
+HOURLY_VARIABLES = ('temperature_2m', 'precipitation', 'wind_speed_10m')
+
+SECONDS_PER_DAY = 86_400
+EPOCH_DATE = date(1970, 1, 1)
+
+# Coordinates are snapped to roughly the forecast model grid
+WEATHER_GRID_DEGREES = 0.1
+WEATHER_EXPIRE_AFTER = 3 * 3600
+WEATHER_STORE_SIZE = 20_000
+
+WeatherKey = Tuple[float, float, date]
+
+__weather_store: 'OrderedDict[WeatherKey, Tuple[float, Dict[str, float]]]' = OrderedDict()
+
+
+def grid_coords(lat: float, lon: float) -> Tuple[float, float]:
+    return (
+        round(round(lat / WEATHER_GRID_DEGREES) * WEATHER_GRID_DEGREES, 4),
+        round(round(lon / WEATHER_GRID_DEGREES) * WEATHER_GRID_DEGREES, 4),
+    )
+
+
+def get_stored_day(lat: float, lon: float, day: date) -> Dict[str, float] | None:
+    key = (lat, lon, day)
+    stored = __weather_store.get(key)
+    if stored is None:
+        return None
+
+    stored_at, aggregates = stored
+    if time.monotonic() - stored_at > WEATHER_EXPIRE_AFTER:
+        del __weather_store[key]
+        return None
+    __weather_store.move_to_end(key)
+    return aggregates
+
+
+def store_day(lat: float, lon: float, day: date, aggregates: Dict[str, float]) -> None:
+    key = (lat, lon, day)
+    __weather_store[key] = (time.monotonic(), aggregates)
+    __weather_store.move_to_end(key)
+    while len(__weather_store) > WEATHER_STORE_SIZE:
+        __weather_store.popitem(last=False)
+
+
+def aggregate_daily(
+    time_start: int,
+    interval: int,
+    hourly: Dict[str, np.ndarray],
+) -> Dict[date, Dict[str, float]]:
+    '''
+    Reduces hourly series (sharing one UTC time axis) to per-day
+    aggregates with NumPy segment reductions. NaN hours are ignored.
+    '''
+    length = min(len(values) for values in hourly.values())
+    if length == 0:
+        return {}
+
+    day_numbers = (time_start + interval * np.arange(length)) // SECONDS_PER_DAY
+    day_index = day_numbers - day_numbers[0]
+    day_starts = np.flatnonzero(np.r_[True, day_index[1:] != day_index[:-1]])
+    present_days = day_index[day_starts]
+    days_count = int(day_index[-1]) + 1
+
+    columns = {}
+    for variable, values in hourly.items():
+        values = np.asarray(values[:length], dtype=np.float64)
+        valid = ~np.isnan(values)
+        sums = np.bincount(day_index[valid], weights=values[valid], minlength=days_count)
+        counts = np.bincount(day_index[valid], minlength=days_count)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            columns[f'{variable}_mean'] = (sums / counts)[present_days]
+        columns[f'{variable}_sum'] = sums[present_days]
+        columns[f'{variable}_min'] = np.fmin.reduceat(values, day_starts)
+        columns[f'{variable}_max'] = np.fmax.reduceat(values, day_starts)
+
+    aggregates = {}
+    for i, day_number in enumerate(day_numbers[day_starts]):
+        day = EPOCH_DATE + timedelta(days=int(day_number))
+        aggregates[day] = {name: float(column[i]) for name, column in columns.items()}
+    return aggregates
+
+
+def _daily_aggregates_of(response: WeatherApiResponse) -> Dict[date, Dict[str, float]]:
+    hourly = response.Hourly()
+    return aggregate_daily(
+        time_start=hourly.Time(),
+        interval=hourly.Interval(),
+        hourly={
+            variable: hourly.Variables(i).ValuesAsNumpy()
+            for i, variable in enumerate(HOURLY_VARIABLES)
+        },
+    )
+
+
+async def fetch_daily_aggregates(
+    points: List[Tuple[float, float]],
+    start_date: date,
+    end_date: date,
+) -> List[Dict[date, Dict[str, float]]]:
+    '''
+    Daily aggregates for several (lat, lon) points in one Open-Meteo
+    request. Open-Meteo answers with one response per point, in order.
+    '''
+    params = {
+        'latitude': ','.join(str(lat) for lat, _ in points),
+        'longitude': ','.join(str(lon) for _, lon in points),
+        'hourly': ','.join(HOURLY_VARIABLES),
+        'start_date': str(start_date),
+        'end_date': str(end_date),
+    }
+    async with upstream_semaphore('open-meteo'):
+        responses = await weather_api(FORECAST_URL, params=params)
+
+    if len(responses) != len(points):
+        raise RuntimeError(f'Open-Meteo returned {len(responses)} responses for {len(points)} points')
+    return [_daily_aggregates_of(response) for response in responses]
+
+
+def _stay_days(location: Location) -> List[date]:
+    return [
+        location.date_start + timedelta(days=offset)
+        for offset in range((location.date_end - location.date_start).days + 1)
+    ]
+
+
+def _weather_summary(location: Location) -> List[Dict[str, str]]:
+    lat, lon = grid_coords(location.lat, location.lon)
+
+    weathers = []
+    for day in _stay_days(location):
+        aggregates = get_stored_day(lat, lon, day)
+        if aggregates is None:
+            continue
+        weathers.append({
+            'date': str(day),
+            'temperature_2m': f'{round(aggregates["temperature_2m_mean"], 1)} ºC',
+            'temperature_2m_range': (
+                f'{round(aggregates["temperature_2m_min"], 1)}'
+                f'..{round(aggregates["temperature_2m_max"], 1)} ºC'
+            ),
+            'precipitation': f'{round(aggregates["precipitation_sum"], 1)} mm',
+            'wind_speed_10m': f'{round(aggregates["wind_speed_10m_max"], 1)} km/h',
+        })
+    return weathers
+
+
+async def fetch_weather_data(location: Location) -> List[Dict[str, str]] | None:
+    '''
+    Daily weather summary over the location's stay. Days already in
+    the weather store are not requested again; only the span between the
+    first and the last missing day is fetched.
+    '''
+    lat, lon = grid_coords(location.lat, location.lon)
+
+    missing = [day for day in _stay_days(location) if get_stored_day(lat, lon, day) is None]
+    if len(missing) > 0:
+        try:
+            [fetched] = await fetch_daily_aggregates([(lat, lon)], missing[0], missing[-1])
+        except Exception:
+            return None
+        for day, aggregates in fetched.items():
+            store_day(lat, lon, day, aggregates)
+
+    return _weather_summary(location)
+
+
+async def fetch_journey_weather(locations: List[Location]) -> List[List[Dict[str, str]] | None]:
+    '''
+    Weather summaries for all stops of a journey, in order. Every grid
+    point still missing days is requested in a single round-trip over the
+    union of the stops' windows; each stop then reads only its own days.
+    Falls back to per-location requests if the batched one fails.
+    '''
+    missing: Dict[Tuple[float, float], List[date]] = {}
+    for location in locations:
+        lat, lon = grid_coords(location.lat, location.lon)
+        for day in _stay_days(location):
+            if get_stored_day(lat, lon, day) is None:
+                missing.setdefault((lat, lon), []).append(day)
+
+    if len(missing) > 0:
+        points = list(missing)
+        start_date = min(min(days) for days in missing.values())
+        end_date = max(max(days) for days in missing.values())
+        try:
+            fetched_per_point = await fetch_daily_aggregates(points, start_date, end_date)
+        except Exception:
+            return list(await asyncio.gather(
+                *[fetch_weather_data(location=location) for location in locations]
+            ))
+        for (lat, lon), fetched in zip(points, fetched_per_point):
+            for day, aggregates in fetched.items():
+                store_day(lat, lon, day, aggregates)
+
+    return [_weather_summary(location) for location in locations]
@@ -1,7 +1,8 @@
 from pathlib import Path
 
-from data.db_session import create_session, global_init
+from data.db_session import global_init, scoped_session
 
 global_init('data/database.sqlite3')
+FSM_STORAGE_FILE = 'data/fsm_storage.sqlite3'
 ROOT = Path(__file__).parent.parent
-session = create_session()
+session = scoped_session()
@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# The bot runs from its own directory and imports its packages top-level
+sys.path.insert(0, str(Path(__file__).parent.parent))
@@ -0,0 +1,20 @@
+from data import db_session
+from data.benchmark import EXPECTED_QUERY_COUNTS, QUERY_COUNT_JOURNEYS, count_queries
+
+
+def test_journey_listings_issue_a_constant_number_of_statements():
+    counts = count_queries()
+
+    assert counts == {
+        name: [expected] * len(QUERY_COUNT_JOURNEYS)
+        for name, expected in EXPECTED_QUERY_COUNTS.items()
+    }
+
+
+def test_query_counts_leave_the_global_engines_alone():
+    factory = getattr(db_session, '__factory')
+    async_factory = getattr(db_session, '__async_factory')
+
+    assert count_queries() == count_queries()
+    assert getattr(db_session, '__factory') is factory
+    assert getattr(db_session, '__async_factory') is async_factory
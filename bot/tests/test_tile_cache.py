@@ -0,0 +1,91 @@
+import asyncio
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+import sqlite3
+import threading
+
+import numpy as np
+from PIL import Image
+import pytest
+
+from services import maps, tile_cache
+
+COORDS = [(37.62, 55.75), (30.31, 59.94), (49.11, 55.79)]
+
+
+def _png_tile() -> bytes:
+    buffer = BytesIO()
+    Image.new('RGB', (256, 256), (200, 220, 240)).save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def tile_server(tmp_path, monkeypatch):
+    ''' Local tile server stand-in; yields the list of tile paths it served. '''
+    tile = _png_tile()
+    requested = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            requested.append(self.path)
+            self.send_response(200)
+            self.send_header('Content-Type', 'image/png')
+            self.send_header('Content-Length', str(len(tile)))
+            self.end_headers()
+            self.wfile.write(tile)
+
+        def log_message(self, *_):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    url_template = f'http://127.0.0.1:{server.server_address[1]}/{{z}}/{{x}}/{{y}}.png'
+    # Render workers are spawned and read these on import
+    monkeypatch.setenv('TILE_URL_TEMPLATE', url_template)
+    monkeypatch.setenv('TILE_CACHE_DIR', str(tmp_path))
+    monkeypatch.setattr(tile_cache, 'TILE_URL_TEMPLATE', url_template)
+    monkeypatch.setattr(tile_cache, 'TILE_CACHE_DIR', tmp_path)
+    # Drop connections and pack views opened against another directory
+    monkeypatch.setattr(tile_cache, '__local', threading.local())
+    monkeypatch.setattr(tile_cache, '__pack', None)
+    yield requested
+    server.shutdown()
+
+
+def _indexed_tiles(directory):
+    connection = sqlite3.connect(directory / 'index.sqlite3')
+    try:
+        return set(connection.execute('SELECT z, x, y FROM tiles'))
+    finally:
+        connection.close()
+
+
+def test_second_render_is_served_from_the_pack(tile_server, tmp_path):
+    legs = [np.array([start, end]) for start, end in zip(COORDS, COORDS[1:])]
+
+    async def render_twice():
+        try:
+            first = await maps.render_map(COORDS, legs)
+            served = len(tile_server)
+            second = await maps.render_map(COORDS, legs)
+            return first, served, second
+        finally:
+            await maps.shutdown_map_renderer()
+
+    first, served, second = asyncio.run(render_twice())
+
+    assert first is not None and second is not None
+    assert served > 0
+    assert len(tile_server) == served
+    assert Image.open(BytesIO(second)).size == (maps.MAP_SIZE, maps.MAP_SIZE)
+    assert _indexed_tiles(tmp_path) == set(maps.map_tiles(COORDS))
+
+
+def test_prefetch_fetches_only_missing_tiles(tile_server):
+    tiles = maps.map_tiles(COORDS)
+
+    assert tile_cache.prefetch_tiles(tiles) == len(tiles)
+    assert tile_cache.prefetch_tiles(tiles) == 0
+    assert len(tile_server) == len(tiles)
+    assert tile_cache.get_tile(*tiles[0]) == _png_tile()
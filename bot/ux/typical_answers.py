@@ -5,6 +5,9 @@ DATE_CONFLICTS_WITH_ANOTHER_DATE = '''
 This date conflicts with another date, associated with this location. Maybe you made a mistake?
 '''
 
+JOURNEY_NO_LONGER_EXISTS = '⚠️ This journey no longer exists. Anything else?'
+NOTE_NO_LONGER_EXISTS = '⚠️ This note no longer exists. Anything else?'
+
 def generate_note_text(note: Note) -> str:
     lines = [f'✏️ {hitalic(note.title)}', note.content]
     return '\n'.join(lines)